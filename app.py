@@ -6,13 +6,19 @@
 """
 
 from __future__ import annotations
+import html
 import json
+import threading
+import time
+from functools import lru_cache
 from pathlib import Path
 from datetime import datetime
 from typing import List
 
 import streamlit as st
-from search_core import batch_search, BiliVideo,search_with_keywords  # type: ignore
+from modules import thumbs
+from modules.metrics import metrics
+from search_core import batch_search, BiliVideo, filter_videos, iter_keywords, merge_filtered  # type: ignore
 
 # ─── Persistent defaults ───────────────────────────────────────────────────
 _DEFAULTS = Path(__file__).with_name("ui_defaults.json")
@@ -54,34 +60,65 @@ st.markdown(
     .video-title a{color:#000;text-decoration:none;}
     .stats{color:#000;font-size:.87rem;line-height:1.45;margin-top:.14rem;}
     .stats b{font-weight:600;margin-right:.55rem;}
+    .video-grid{display:grid;grid-template-columns:repeat(auto-fill,minmax(230px,1fr));gap:0 1rem;}
     </style>
     """,
     unsafe_allow_html=True,
 )
 
 # ─── Cached backend ────────────────────────────────────────────────────────
-@st.cache_data(show_spinner="📡 正在抓取视频…")
-def fetch_videos(
+# 原始结果按 (关键词, 条数, 时间范围) 单独缓存，筛选条件只在本地重新计算：
+# 调整播放量 / 点赞率 / 屏蔽词不会联网，新增关键词也只抓新增的那一个。
+RAW_TTL = 600  # 秒
+METRICS_MAX_AGE = 3600  # WebUI 不导出指标，每小时清零一次，按关键词累积的序列不会无限增多
+
+@st.cache_resource
+def _raw_store() -> tuple[dict, threading.Lock]:
+    return {}, threading.Lock()
+
+def iter_raw(
         keywords: List[str],
         page_size: int,
         data_mode: str,
-        min_play: int,
-        min_like: float,
-        banned: List[str],
         *,
         custom_start=None,
         custom_end=None
-) -> List[BiliVideo]:
-    return search_with_keywords(
-        keywords,
-        page_size,
-        data_mode,
-        min_play=min_play,
-        min_like_ratio=min_like,
-        banned_keywords=banned,
-        custom_start=custom_start,
-        custom_end=custom_end,
-    )
+):
+    """逐个 yield (关键词, 原始结果)：先给出缓存命中的，再按抓取完成先后给出其余的。
+
+    请求失败的关键词给出空结果但不缓存，下次检索时重新抓取。
+    """
+    metrics.rotate(METRICS_MAX_AGE)
+    store, lock = _raw_store()
+    now = time.time()
+    missing = []
+    with lock:
+        for k in [k for k, (ts, _) in store.items() if now - ts > RAW_TTL]:
+            del store[k]
+        cached = []
+        for kw in dict.fromkeys(keywords):
+            key = (kw, page_size, data_mode, custom_start, custom_end)
+            if key in store:
+                cached.append((kw, store[key][1]))
+            else:
+                missing.append(kw)
+    yield from cached
+    if missing:
+        for kw, vids in iter_keywords(
+            missing,
+            page_size,
+            data_mode,
+            custom_start=custom_start,
+            custom_end=custom_end,
+            none_on_error=True,
+        ):
+            if vids is None:
+                yield kw, []
+                continue
+            with lock:
+                store[(kw, page_size, data_mode, custom_start, custom_end)] = (now, vids)
+            yield kw, vids
+
 # ─── Session init ──────────────────────────────────────────────────────────
 if "keywords" not in st.session_state:
     st.session_state["keywords"]=", ".join(ui_defaults.get("keywords",[]))
@@ -148,6 +185,59 @@ with st.form("filters"):
 
     submitted = st.form_submit_button("🚀 开始检索")
 
+# ─── Grid ─────────────────────────────────────────────────────────────────
+# 每张卡片的 HTML 只生成一次（按内容缓存，跨 rerun / 会话复用），
+# 一页卡片拼成一个 CSS grid 片段，用一次 st.markdown 输出。
+GRID_PAGE_KEY = "grid_page"
+GRID_SHOWN_KEY = "grid_shown"
+PER_PAGE_OPTIONS = [24, 48, 96, 192]
+
+@st.cache_resource
+def _thumb_service():
+    """config.json 中启用 thumbs 时，在本进程内启动本地缩略图服务"""
+    settings=thumbs.load_settings()
+    return thumbs.create_service(settings).start() if settings["enabled"] else None
+
+@st.cache_resource
+def _card_html():
+    service=_thumb_service()
+    @lru_cache(maxsize=8192)
+    def card(bvid, title, author, play, like, favorites, cover):
+        cover=thumbs.cover_url(cover, service)
+        link=f"https://www.bilibili.com/video/{bvid}"
+        return (
+            f"<div><div class='video-card'><a href='{link}' target='_blank' referrerpolicy='no-referrer'>"
+            f"<img src='{html.escape(cover, quote=True)}' loading='lazy'/></a></div>"
+            f"<div class='video-info'><div class='video-title'><a href='{link}' target='_blank' referrerpolicy='no-referrer'>{html.escape(title)}</a></div>"
+            f"<div class='stats'>▶️{play} 👍{like} 💾{favorites}<br><b>UP:</b> {html.escape(author)}</div></div></div>"
+        )
+    return card
+
+def render(vs:List[BiliVideo]):
+    card=_card_html()
+    cards="".join(card(v.bvid,v.title,v.author,v.play,v.like,v.favorites,v.cover) for v in vs)
+    st.markdown(f"<div class='video-grid'>{cards}</div>", unsafe_allow_html=True)
+
+def render_paged(vs:List[BiliVideo]):
+    """分页 / 无限滚动两种浏览方式，只渲染当前可见的切片"""
+    c_mode,c_per,c_page=st.columns([2,2,3])
+    mode=c_mode.radio("浏览方式",["分页","无限滚动"],horizontal=True,key="grid_mode")
+    per_page=c_per.selectbox("每页条数",PER_PAGE_OPTIONS,index=0,key="grid_per_page")
+    pages=max(1,(len(vs)+per_page-1)//per_page)
+
+    if mode=="分页":
+        if st.session_state.get(GRID_PAGE_KEY,1)>pages:
+            st.session_state[GRID_PAGE_KEY]=pages
+        page=c_page.number_input(f"页码（共 {pages} 页）",min_value=1,max_value=pages,step=1,key=GRID_PAGE_KEY)
+        render(vs[(page-1)*per_page:page*per_page])
+    else:
+        shown=max(per_page,st.session_state.get(GRID_SHOWN_KEY,per_page))
+        render(vs[:shown])
+        if shown<len(vs):
+            if st.button(f"加载更多（已显示 {shown}/{len(vs)}）",use_container_width=True):
+                st.session_state[GRID_SHOWN_KEY]=shown+per_page
+                st.rerun()
+
 # ─── Fetch ────────────────────────────────────────────────────────────────
 
 
@@ -158,17 +248,33 @@ if submitted:
 
     kw     = [k.strip() for k in kw_raw.split(",")     if k.strip()]
     banned = [b.strip() for b in banned_raw.split(",") if b.strip()]
-    with st.spinner("正在检索并筛选…"):
-        vids = fetch_videos(
-            kw or [""],
+    # 逐个关键词到达即刷新：进度条显示各关键词的命中数，网格先展示已到达部分
+    queries = kw or [""]
+    total = len(set(queries))
+    filters = dict(min_play=min_play, min_like_ratio=min_like_pct / 100, banned_keywords=banned)
+    progress = st.progress(0.0, text="正在检索…")
+    partial_grid = st.empty()
+    raw, kept = {}, {}
+    for k, vids in iter_raw(
+            queries,
             page_size,
             time_mode,
-            min_play,
-            min_like_pct / 100,
-            banned,
             custom_start=custom_start,
             custom_end=custom_end
-        )
+    ):
+        raw[k] = vids
+        kept[k] = filter_videos(vids, shuffle=False, **filters)
+        if _thumb_service():
+            _thumb_service().prefetch(v.cover for v in kept[k])
+        partial = list({v.bvid: v for x in queries if x in kept for v in kept[x]}.values())
+        counts = " · ".join(f"{x or '（空）'} {len(kept[x])}/{len(raw[x])}" for x in raw)
+        progress.progress(len(raw) / total, text=f"已完成 {len(raw)}/{total}：{counts}")
+        with partial_grid.container():
+            render(partial[:PER_PAGE_OPTIONS[0]])
+    progress.empty()
+    partial_grid.empty()
+    # 全部到齐后按关键词顺序统一去重 / 打乱，替换掉中间结果
+    vids = merge_filtered([raw[x] for x in queries], **filters)
     st.session_state[VIDEOS_KEY]=vids
     st.session_state["keywords"]=keywords_text
     st.session_state["banned"]=banned_text
@@ -183,31 +289,12 @@ if submitted:
         "custom_start": custom_start.isoformat() if custom_start else None,
         "custom_end": custom_end.isoformat() if custom_end else None
     })
+    st.session_state.pop(GRID_PAGE_KEY,None)
+    st.session_state.pop(GRID_SHOWN_KEY,None)
     st.success(f"找到 {len(vids)} 条符合条件的视频")
 
-# ─── Grid ─────────────────────────────────────────────────────────────────
-
-def render(vs:List[BiliVideo]):
-    cols=4
-    for i in range(0,len(vs),cols):
-        row=st.columns(cols)
-        for j,col in enumerate(row):
-            idx=i+j
-            if idx>=len(vs): break
-            v=vs[idx]
-            cover=v.cover.replace("http://","https://") if v.cover else ""
-            if cover.startswith("//"):cover="https:"+cover
-            cover="https://images.weserv.nl/?url="+cover.lstrip("https://")
-            link=f"https://www.bilibili.com/video/{v.bvid}"
-            col.markdown(
-                f"<div class='video-card'><a href='{link}' target='_blank' referrerpolicy='no-referrer'>"
-                f"<img src='{cover}'/></a></div>"
-                f"<div class='video-info'><div class='video-title'><a href='{link}' target='_blank' referrerpolicy='no-referrer'>{v.title}</a></div>"
-                f"<div class='stats'>▶️{v.play} 👍{v.like} 💾{v.favorites}<br><b>UP:</b> {v.author}</div></div>",
-                unsafe_allow_html=True)
-
 if VIDEOS_KEY in st.session_state and st.session_state[VIDEOS_KEY]:
-    render(st.session_state[VIDEOS_KEY])
+    render_paged(st.session_state[VIDEOS_KEY])
 
 
 #streamlit run app.py
@@ -0,0 +1,165 @@
+"""离线端到端压测：在本地替身服务器上测 batch_search / search_with_keywords /
+pushplus.fetch_new_videos 的吞吐、延迟、峰值内存和筛选耗时。
+
+    python -m bench.run_bench --keywords 1 4 8 16 --page-sizes 20 50 --latency 0.05
+    python -m bench.run_bench --json bench_output.json
+
+磁盘响应缓存在压测期间关闭，保证每次都真正走网络。限流器默认换成不设限的实例，
+传 --rate 时按给定的初始速率（次/秒）启用自适应限流，用于观察限流本身的开销。
+"""
+import argparse
+import json
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import pushplus
+import search_core
+from bench.stub_server import StubConfig, StubServer, load_recorded
+from modules import bilibili_search, columnar, ratelimit  # noqa: F401  columnar: 预先导入 numpy，不计入首个用例
+from modules.history import HistoryStore
+
+FILTERS = {"min_play": 3000, "min_like_ratio": 0.06, "banned_keywords": ["曼波", "广告"]}
+
+
+class LatencyProbe:
+    """包装 bilibili_search.fetch_page，记录每个请求的客户端耗时"""
+
+    def __init__(self):
+        self.samples = []
+        self._orig = bilibili_search.fetch_page
+
+    def __enter__(self):
+        def timed(params):
+            t0 = time.perf_counter()
+            try:
+                return self._orig(params)
+            finally:
+                self.samples.append(time.perf_counter() - t0)
+        bilibili_search.fetch_page = timed
+        return self
+
+    def __exit__(self, *exc):
+        bilibili_search.fetch_page = self._orig
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    idx = min(len(values) - 1, max(0, round(pct / 100 * (len(values) - 1))))
+    return values[idx]
+
+
+def run_case(name, fn, server):
+    server.reset_stats()
+    tracemalloc.start()
+    with LatencyProbe() as probe:
+        t0 = time.perf_counter()
+        result = fn()
+        wall = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    reqs = server.stats["requests"]
+    return {
+        "case": name,
+        "results": len(result),
+        "requests": reqs,
+        "errors": server.stats["errors"],
+        "wall_s": round(wall, 4),
+        "req_per_s": round(reqs / wall, 1) if wall else 0.0,
+        "p50_ms": round(percentile(probe.samples, 50) * 1000, 2),
+        "p99_ms": round(percentile(probe.samples, 99) * 1000, 2),
+        "peak_mem_kb": peak // 1024,
+        "bytes_kb": server.stats["bytes"] // 1024,
+    }
+
+
+def filter_time(keywords, page_size, repeat=5):
+    """只测本地筛选：抓一次原始结果，多次 merge_filtered 取最好成绩"""
+    raw = search_core.fetch_keywords(keywords, page_size, "3d")
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        search_core.merge_filtered(raw, **FILTERS)
+        best = min(best, time.perf_counter() - t0)
+    return sum(len(r) for r in raw), best
+
+
+def bench(keyword_counts, page_sizes, conf: StubConfig, max_pages=3, rate=None):
+    rows = []
+    with StubServer(conf) as server, tempfile.TemporaryDirectory() as tmp:
+        orig = (bilibili_search.SEARCH_URL, bilibili_search.get_cache, bilibili_search.record_stats,
+                pushplus.PUSHPLUS_URL, ratelimit._limiter)
+        bilibili_search.SEARCH_URL = server.search_url
+        bilibili_search.get_cache = lambda: None
+        bilibili_search.record_stats = lambda data: None    # 合成数据不能写进真实的快照库
+        pushplus.PUSHPLUS_URL = server.push_url
+        if rate is None:
+            ratelimit._limiter = ratelimit.AdaptiveLimiter(
+                rate=1e6, max_rate=1e6, burst=1e6, concurrency=1024, max_concurrency=1024)
+        else:
+            ratelimit._limiter = ratelimit.AdaptiveLimiter(rate=rate, burst=rate)
+        try:
+            for n in keyword_counts:
+                keywords = [f"kw{i}" for i in range(n)]
+                for ps in page_sizes:
+                    tag = f"k={n} ps={ps}"
+                    rows.append(run_case(
+                        f"batch_search {tag}",
+                        lambda: search_core.batch_search(keywords, ps, "3d", **FILTERS),
+                        server,
+                    ))
+                    rows.append(run_case(
+                        f"search_with_keywords {tag}",
+                        lambda: search_core.search_with_keywords(keywords, ps, "3d", **FILTERS),
+                        server,
+                    ))
+                    history = HistoryStore(Path(tmp) / f"hist_{n}_{ps}.db")
+                    pushplus.KEYWORDS, pushplus.PAGE_SIZE, pushplus.MAX_PAGES = keywords, ps, max_pages
+                    rows.append(run_case(
+                        f"fetch_new_videos {tag}",
+                        lambda: pushplus.fetch_new_videos(history),
+                        server,
+                    ))
+                    history.close()
+                    count, secs = filter_time(keywords, ps)
+                    rows.append({"case": f"filter_only {tag}", "results": count,
+                                 "filter_ms": round(secs * 1000, 3)})
+        finally:
+            (bilibili_search.SEARCH_URL, bilibili_search.get_cache, bilibili_search.record_stats,
+             pushplus.PUSHPLUS_URL, ratelimit._limiter) = orig
+    return rows
+
+
+def print_table(rows):
+    cols = ["case", "results", "requests", "errors", "wall_s", "req_per_s",
+            "p50_ms", "p99_ms", "peak_mem_kb", "bytes_kb", "filter_ms"]
+    widths = {c: max(len(c), *(len(str(r.get(c, ""))) for r in rows)) for c in cols}
+    print("  ".join(c.ljust(widths[c]) for c in cols))
+    for r in rows:
+        print("  ".join(str(r.get(c, "")).ljust(widths[c]) for c in cols))
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="BiliDream 离线压测")
+    ap.add_argument("--keywords", type=int, nargs="+", default=[1, 4, 8])
+    ap.add_argument("--page-sizes", type=int, nargs="+", default=[20, 50])
+    ap.add_argument("--latency", type=float, default=0.05)
+    ap.add_argument("--jitter", type=float, default=0.02)
+    ap.add_argument("--payload-bytes", type=int, default=200)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--num-pages", type=int, default=5)
+    ap.add_argument("--max-pages", type=int, default=3, help="fetch_new_videos 每关键词最多翻页数")
+    ap.add_argument("--recorded", help="回放录制的响应文件（JSON 列表）")
+    ap.add_argument("--rate", type=float, help="启用自适应限流并设定初始速率（次/秒）")
+    ap.add_argument("--json", help="把结果另存为 JSON 文件")
+    args = ap.parse_args()
+
+    conf = StubConfig(args.latency, args.jitter, args.payload_bytes, args.error_rate,
+                      args.num_pages, load_recorded(args.recorded) if args.recorded else None)
+    rows = bench(args.keywords, args.page_sizes, conf, args.max_pages, args.rate)
+    print_table(rows)
+    if args.json:
+        Path(args.json).write_text(json.dumps(rows, ensure_ascii=False, indent=2), "utf-8")
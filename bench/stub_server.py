@@ -0,0 +1,178 @@
+"""本地 B 站搜索接口替身，用于离线压测。
+
+模拟 /x/web-interface/search/type：按 (关键词, 页码) 生成确定性的合成结果，
+或回放录制好的响应文件；可配置响应延迟、单条负载大小和出错概率。
+
+    python -m bench.stub_server --port 8901 --latency 0.05 --error-rate 0.01
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from modules.bvid import av2bv
+
+SEARCH_PATH = "/x/web-interface/search/type"
+PUSH_PATH = "/send"
+
+
+class StubConfig:
+    def __init__(self, latency=0.0, jitter=0.0, payload_bytes=0, error_rate=0.0,
+                 num_pages=5, recorded=None, seed=0):
+        self.latency = latency              # 每个请求的基础延迟（秒）
+        self.jitter = jitter                # 在基础延迟上叠加 [0, jitter) 的随机延迟
+        self.payload_bytes = payload_bytes  # 每条结果额外填充的字节数（模拟 description 等字段）
+        self.error_rate = error_rate        # 返回 412 / 风控错误码的概率
+        self.num_pages = num_pages
+        self.recorded = recorded            # 录制的 data 字段列表，按页码回放
+        self.seed = seed
+
+
+def synth_page(keyword, page, page_size, conf: StubConfig, start_ts=0, end_ts=0):
+    """生成一页确定性的合成搜索结果（data 字段）"""
+    rng = random.Random(f"{conf.seed}:{keyword}:{page}")
+    pad = "x" * conf.payload_bytes
+    span = max(1, end_ts - start_ts)
+    result = []
+    for i in range(page_size):
+        play = int(rng.lognormvariate(8, 1.6))
+        result.append({
+            "bvid": av2bv(rng.randrange(1, 2**40)),
+            "title": f"<em class=\"keyword\">{keyword}</em> 合成视频 {page}-{i}",
+            "author": f"up{rng.randrange(500)}",
+            "play": play,
+            "like": int(play * rng.uniform(0, 0.15)),
+            "favorites": int(play * rng.uniform(0, 0.05)),
+            "tag": f"{keyword},合成,测试",
+            "pic": "//i0.hdslb.com/bfs/archive/stub.jpg",
+            "pubdate": start_ts + rng.randrange(span),
+            "description": pad,
+        })
+    return {"numPages": conf.num_pages, "numResults": conf.num_pages * page_size, "result": result}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    conf: StubConfig = None
+    stats = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with self.stats["lock"]:
+            self.stats["bytes"] += len(body)
+
+    def do_GET(self):
+        conf = self.conf
+        url = urlparse(self.path)
+        with self.stats["lock"]:
+            self.stats["requests"] += 1
+        if url.path != SEARCH_PATH:
+            return self._send(404, {"code": -404, "message": "not found"})
+
+        time.sleep(conf.latency + random.random() * conf.jitter)
+        if conf.error_rate and random.random() < conf.error_rate:
+            with self.stats["lock"]:
+                self.stats["errors"] += 1
+            if random.random() < 0.5:
+                return self._send(412, {"code": -412, "message": "请求被拦截"})
+            return self._send(200, {"code": -412, "message": "请求过于频繁"})
+
+        q = {k: v[0] for k, v in parse_qs(url.query).items()}
+        page = int(q.get("page", 1))
+        page_size = int(q.get("page_size", 20))
+        if conf.recorded:
+            data = conf.recorded[(page - 1) % len(conf.recorded)]
+        elif page > conf.num_pages:
+            data = {"numPages": conf.num_pages, "result": []}
+        else:
+            data = synth_page(q.get("keyword", ""), page, page_size, conf,
+                              int(q.get("pubtime_begin_s", 0)), int(q.get("pubtime_end_s", 0)))
+        self._send(200, {"code": 0, "message": "0", "data": data})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        time.sleep(self.conf.latency)
+        self._send(200, {"code": 200, "msg": "请求成功"})
+
+
+class StubServer:
+    """在后台线程中运行的替身服务器"""
+
+    def __init__(self, conf: StubConfig | None = None, host="127.0.0.1", port=0):
+        self.conf = conf or StubConfig()
+        self.stats = {"requests": 0, "errors": 0, "bytes": 0, "lock": threading.Lock()}
+        handler = type("Handler", (_Handler,), {"conf": self.conf, "stats": self.stats})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def search_url(self):
+        return self.base_url + SEARCH_PATH
+
+    @property
+    def push_url(self):
+        return self.base_url + PUSH_PATH
+
+    def reset_stats(self):
+        with self.stats["lock"]:
+            self.stats.update(requests=0, errors=0, bytes=0)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def load_recorded(path):
+    """读取录制文件：搜索接口完整响应或其 data 字段组成的 JSON 列表"""
+    with open(path, "r", encoding="utf-8") as f:
+        pages = json.load(f)
+    return [p.get("data", p) for p in pages]
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="本地 B 站搜索接口替身")
+    ap.add_argument("--port", type=int, default=8901)
+    ap.add_argument("--latency", type=float, default=0.05)
+    ap.add_argument("--jitter", type=float, default=0.0)
+    ap.add_argument("--payload-bytes", type=int, default=0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--num-pages", type=int, default=5)
+    ap.add_argument("--recorded", help="回放录制的响应文件（JSON 列表）")
+    args = ap.parse_args()
+
+    conf = StubConfig(args.latency, args.jitter, args.payload_bytes, args.error_rate,
+                      args.num_pages, load_recorded(args.recorded) if args.recorded else None)
+    server = StubServer(conf, port=args.port)
+    print("stub search:", server.search_url)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
@@ -0,0 +1,144 @@
+"""无界面的批量检索命令行：读取关键词 profile，并行检索，以 JSONL 流式输出。
+
+    python -m bilidream profiles.json > videos.jsonl
+    echo '{"keywords": ["mygo"], "min_play": 5000}' | python -m bilidream
+    python -m bilidream profiles.json --workers 8 | head -n 20
+
+输入可以是 JSON 数组、单个 JSON 对象或每行一个对象的 JSONL；省略文件名或
+写 "-" 时从标准输入读取。每条通过筛选的视频立即输出一行：
+
+    {"profile": "...", "keyword": "...", "pubdate": 1700000000, "bvid": "...", ...}
+
+只依赖 search_core，不会导入 Streamlit 界面；dateutil、numpy 都在首次用到时才导入。
+"""
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from search_core import sharded_search, stream_search
+
+DEFAULT_PROFILE = {
+    "keywords": [],
+    "banned_keywords": [],
+    "allow_keywords": None,
+    "required_keywords": None,
+    "min_play": 1000,
+    "min_like_ratio": 0.04,
+    "min_favorites": 0,
+    "page_size": 20,
+    "max_pages": 1,
+    "data_mode": "3d",
+    "custom_start": None,
+    "custom_end": None,
+    "limit": None,                  # 每个 profile 最多输出多少条
+    "sharded": False,               # 按发布时间分片抓全长时间范围，忽略 max_pages
+}
+FILTER_KEYS = ("banned_keywords", "allow_keywords", "required_keywords",
+               "min_play", "min_like_ratio", "min_favorites")
+_DONE = object()
+
+
+def parse_profiles(text: str) -> list:
+    text = text.strip()
+    if not text:
+        return []
+    try:
+        raw = json.loads(text)
+    except json.JSONDecodeError:
+        raw = [json.loads(line) for line in text.splitlines() if line.strip()]
+    if isinstance(raw, dict):
+        raw = [raw]
+    profiles = []
+    for i, p in enumerate(raw):
+        profile = {**DEFAULT_PROFILE, **p}
+        profile.setdefault("name", f"profile{i}")
+        profiles.append(profile)
+    return profiles
+
+
+def iter_profile(profile):
+    filters = {k: profile[k] for k in FILTER_KEYS}
+    window = {"custom_start": profile["custom_start"], "custom_end": profile["custom_end"]}
+    if profile["sharded"]:
+        videos = sharded_search(profile["keywords"], profile["page_size"], profile["data_mode"],
+                                **window, **filters)
+    else:
+        videos = stream_search(profile["keywords"], profile["page_size"], profile["data_mode"],
+                               max_pages=profile["max_pages"], **window, **filters)
+    limit = profile["limit"]
+    for i, v in enumerate(videos, 1):
+        yield v
+        if limit is not None and i >= limit:
+            return
+
+
+def run(profiles, out, workers=4) -> int:
+    """并行执行所有 profile，结果按到达顺序写入 out；返回输出条数"""
+    results = queue.Queue(maxsize=1024)
+    stop = threading.Event()
+
+    def produce(profile):
+        try:
+            for v in iter_profile(profile):
+                if stop.is_set():
+                    return
+                results.put((profile["name"], v))
+        except Exception as e:      # 单个 profile 出错不影响其他 profile
+            print(f"[{profile['name']}] 运行出错: {e}", file=sys.stderr)
+        finally:
+            results.put(_DONE)
+
+    count = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for p in profiles:
+            pool.submit(produce, p)
+        remaining = len(profiles)
+        try:
+            while remaining:
+                item = results.get()
+                if item is _DONE:
+                    remaining -= 1
+                    continue
+                name, v = item
+                record = {"profile": name, "keyword": v.keyword, "pubdate": v.pubdate, **v.to_dict()}
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                count += 1
+        finally:
+            stop.set()
+            while remaining:        # 让阻塞在 put 上的生产者退出
+                if results.get() is _DONE:
+                    remaining -= 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bilidream", description="B 站视频批量检索（JSONL 输出）")
+    parser.add_argument("profiles", nargs="?", default="-", help="profile 文件，- 表示标准输入")
+    parser.add_argument("--workers", type=int, default=4, help="同时执行的 profile 数")
+    args = parser.parse_args(argv)
+
+    if args.profiles == "-":
+        text = sys.stdin.read()
+    else:
+        with open(args.profiles, "r", encoding="utf-8") as f:
+            text = f.read()
+    profiles = parse_profiles(text)
+    if not profiles:
+        parser.error("没有读到任何 profile")
+
+    try:
+        count = run(profiles, sys.stdout, workers=args.workers)
+    except BrokenPipeError:         # 下游（如 head）提前关闭管道
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    print(f"共输出 {count} 条", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,21 +1,59 @@
-import requests
 import re
+import time
+import requests
 from modules import tool
+from modules.client import get_client
+from modules.metrics import metrics
+from modules.ratelimit import get_limiter
+from modules.response_cache import get_cache, make_key
+from modules.singleflight import SingleFlight
 import json
 
+SEARCH_URL = "https://api.bilibili.com/x/web-interface/search/type"
+REQUEST_TIMEOUT = 10
+THROTTLE_STATUS = {412, 429}
+THROTTLE_CODES = {-412, -352, -509, -799}   # B 站风控 / 请求过于频繁
+
+# 同一时刻完全相同的请求（关键词、时间范围、页码、排序……）只发一次，结果共享
+_flight = SingleFlight("search_singleflight")
+
+_HTML_TAG = re.compile(r'<.*?>')
+
 def clean_html(raw_text):
-    return re.sub(r'<.*?>', '', raw_text)
+    return _HTML_TAG.sub('', raw_text)
+
+def _to_int(value):
+    """接口数值字段容错：可能是 int，也可能是带逗号的字符串或 "--" """
+    if isinstance(value, int):
+        return value
+    try:
+        return int(str(value).replace(",", ""))
+    except ValueError:
+        return 0
 
 class BiliVideo:
+    # 数值字段在构造时一次性解析，search_text 为预先拼好的小写 "标题 标签"，
+    # 供 filter_videos 反复筛选时直接使用
+    __slots__ = ("bvid", "title", "author", "play", "like", "tag",
+                 "favorites", "cover", "pubdate", "keyword", "search_text")
+
     def __init__(self, raw_data: dict):
         self.bvid = raw_data.get("bvid", "").strip()
         self.title = clean_html(raw_data.get("title", ""))
         self.author = raw_data.get("author", "")
-        self.play = raw_data.get("play", "0")
-        self.like = raw_data.get("like", "0")
+        self.play = _to_int(raw_data.get("play", 0))
+        self.like = _to_int(raw_data.get("like", 0))
         self.tag = raw_data.get("tag", "")
-        self.favorites = raw_data.get("favorites", "0")
+        self.favorites = _to_int(raw_data.get("favorites", 0))
         self.cover= 'https:'+raw_data.get("pic", "")
+        self.pubdate = _to_int(raw_data.get("pubdate", 0))  # 发布时间戳（秒）
+        self.keyword = ""   # 命中的搜索关键词，由搜索函数填写
+        self.search_text = f"{self.title} {self.tag}".lower()
+
+    @classmethod
+    def from_results(cls, items) -> list:
+        """把接口的 data["result"] 数组一次性转为 BiliVideo 列表，跳过缺少 bvid 的条目"""
+        return [v for v in map(cls, items) if v.bvid]
 
     def to_dict(self):
         return {
@@ -42,50 +80,239 @@ class BiliVideo:
             f")"
         )
 
-def search_bilibili_videos(
-        keyword,
-        page_size,
-        data_mode,
-        *,
-        custom_start=None,              # ← 新增
-        custom_end=None                 # ← 新增
-):
-    url = "https://api.bilibili.com/x/web-interface/search/type"
-
-    time_range = tool.get_time_range(
-        data_mode,
-        custom_start=custom_start,  # ← 终于传给工具函数
-        custom_end=custom_end
-    )
-    params = {
+def build_params(keyword, page, page_size, time_range, order="totalrank"):
+    """构造搜索接口的请求参数"""
+    return {
         "keyword": keyword,
         "search_type": "video",
-        "page": 1,
+        "page": page,
         "page_size": page_size,
-        "order": "totalrank",
+        "order": order,
         "duration": 0,
         "pubtime_begin_s": time_range['start_ts'],
         "pubtime_end_s": time_range['end_ts']
     }
 
-    headers, cookies = tool.load_config_from_parent()
-    resp = requests.get(url, headers=headers, cookies=cookies, params=params)
+
+def _request_once(params):
+    """发出一次请求，返回 (data, outcome)，outcome 为 ok / throttle / network / error"""
+    keyword = params["keyword"]
+    t0 = time.perf_counter()
+    try:
+        resp = get_client().get(SEARCH_URL, params=params, timeout=REQUEST_TIMEOUT)
+    except requests.RequestException as e:
+        print("请求失败:", e)
+        metrics.incr("search_errors_total", keyword=keyword, reason="network")
+        return None, "network"
+    wall = time.perf_counter() - t0
+    size = len(resp.content)
+    metrics.observe("search_request_seconds", wall)
+    metrics.incr("search_requests_total", keyword=keyword)
+    metrics.incr("search_bytes_total", size, keyword=keyword)
 
     if resp.status_code != 200:
         print("请求失败，状态码：", resp.status_code)
-        return []
+        metrics.incr("search_errors_total", keyword=keyword, reason=f"http_{resp.status_code}")
+        metrics.event("search", keyword=keyword, page=params["page"], status=resp.status_code,
+                      bytes=size, wall=round(wall, 4))
+        return None, "throttle" if resp.status_code in THROTTLE_STATUS else "error"
 
+    t1 = time.perf_counter()
     try:
-        data = resp.json()
-        result = []
-        for item in data["data"]["result"]:
-            video = BiliVideo(item)
-            if video.bvid:  # 确保 bvid 存在
-                result.append(video)
-        return result
+        payload = json.loads(resp.content)
+        decode = time.perf_counter() - t1
+        metrics.observe("search_json_decode_seconds", decode)
+        metrics.event("search", keyword=keyword, page=params["page"], status=resp.status_code,
+                      code=payload.get("code"), bytes=size, wall=round(wall, 4), decode=round(decode, 5))
+        code = payload.get("code", 0)
+        if code != 0:
+            print("请求失败，错误码：", code, payload.get("message"))
+            metrics.incr("search_errors_total", keyword=keyword, reason=f"code_{code}")
+            return None, "throttle" if code in THROTTLE_CODES else "error"
+        return payload["data"], "ok"
     except Exception as e:
         print("解析失败:", e)
-        return []
+        metrics.incr("search_errors_total", keyword=keyword, reason="parse")
+        return None, "error"
+
+
+def fetch_page(params):
+    """请求一页搜索结果，返回接口中的 data 字段；失败时返回 None
+
+    成功的响应会写入磁盘缓存（见 response_cache），未过期时直接复用。
+    缓存未命中时，并发的相同请求合并为一次上游调用（见 singleflight）。
+    请求经过共享限流器（见 ratelimit）：遇到风控或网络错误时按退避策略重试，
+    连续失败触发熔断后直接返回 None。
+    每次请求的耗时、字节数和 JSON 解析耗时记录到 modules.metrics。
+    """
+    keyword = params["keyword"]
+    cache = get_cache()
+    if cache is not None:
+        data = cache.get(params)
+        if data is not None:
+            metrics.incr("search_cache_hits_total", keyword=keyword)
+            return data
+    return _flight.do(make_key(params), _fetch_upstream, params, cache)
+
+
+def _fetch_upstream(params, cache):
+    keyword = params["keyword"]
+    limiter = get_limiter()
+    for attempt in range(limiter.max_retries + 1):
+        if not limiter.breaker.allow():
+            print("请求失败：限流熔断中，跳过", keyword)
+            metrics.incr("search_errors_total", keyword=keyword, reason="circuit_open")
+            return None
+        if attempt:
+            metrics.incr("search_retries_total", keyword=keyword)
+
+        outcome = "error"
+        try:
+            with limiter.slot():
+                data, outcome = _request_once(params)
+        finally:
+            # 非风控错误（或意外异常）不计入熔断，但要结束可能正在进行的半开试探，
+            # 否则熔断器会一直拒绝后续请求
+            if outcome == "error":
+                limiter.breaker.release()
+
+        if outcome == "ok":
+            limiter.on_success()
+            break
+        if outcome == "error":      # 非风控的错误，重试也无济于事
+            return None
+        if outcome == "throttle":
+            limiter.on_throttle()
+            metrics.incr("search_throttled_total", keyword=keyword)
+        else:
+            limiter.on_error()
+        if attempt < limiter.max_retries:
+            time.sleep(limiter.backoff(attempt))
+    else:
+        return None
+
+    metrics.incr("search_results_total", len(data.get("result") or []), keyword=keyword)
+    if cache is not None:
+        cache.set(params, data)
+    record_stats(data)
+    return data
+
+
+def record_stats(data):
+    """把一页新抓到的结果写入数据快照库（见 stats_store）；缓存命中的旧数据不记录"""
+    from modules.stats_store import get_stats_store   # 延迟导入 numpy
+
+    store = get_stats_store()
+    if store is not None:
+        store.ingest(BiliVideo.from_results(data.get("result") or []))
+
+
+def parse_videos(data, keyword=""):
+    """把 data["result"] 转为 BiliVideo 列表，跳过缺少 bvid 的条目"""
+    videos = BiliVideo.from_results(data.get("result") or [])
+    for v in videos:
+        v.keyword = keyword
+    return videos
+
+
+def iter_bilibili_pages(
+        keyword,
+        page_size,
+        data_mode,
+        *,
+        custom_start=None,
+        custom_end=None,
+        since_ts=None,
+        overlap=0,
+        max_pages=None,
+        order=None
+):
+    """逐页惰性抓取同一关键词的搜索结果，每次 yield 一页 BiliVideo 列表。
+
+    只有在调用方继续迭代时才会请求下一页；遇到请求失败、结果不足一页、
+    到达接口返回的 numPages 或 max_pages 时结束；因请求失败而结束时生成器返回 False。
+    data_mode='since' 时从水位线 since_ts（回退 overlap 秒）开始检索，
+    且默认按发布时间从新到旧排序（order="pubdate"），其余模式默认综合排序。
+    """
+    if order is None:
+        order = "pubdate" if data_mode == "since" else "totalrank"
+    time_range = tool.get_time_range(
+        data_mode,
+        custom_start=custom_start,
+        custom_end=custom_end,
+        since_ts=since_ts,
+        overlap=overlap
+    )
+    page = 1
+    while max_pages is None or page <= max_pages:
+        data = fetch_page(build_params(keyword, page, page_size, time_range, order))
+        if data is None:
+            return False
+        videos = parse_videos(data, keyword)
+        yield videos
+
+        num_pages = data.get("numPages") or 0
+        if len(data.get("result") or []) < page_size or page >= num_pages:
+            return
+        page += 1
+
+
+def iter_bilibili_videos(
+        keyword,
+        page_size,
+        data_mode,
+        *,
+        custom_start=None,
+        custom_end=None,
+        max_pages=None,
+        limit=None,
+        until=None
+):
+    """逐条 yield BiliVideo，按需翻页。
+
+    Args:
+        max_pages: 最多翻多少页，None 表示直到接口没有更多结果。
+        limit:     最多产出多少条。
+        until:     谓词 until(video) 返回 True 时，产出该条后立即停止。
+    """
+    count = 0
+    for videos in iter_bilibili_pages(
+            keyword,
+            page_size,
+            data_mode,
+            custom_start=custom_start,
+            custom_end=custom_end,
+            max_pages=max_pages
+    ):
+        for video in videos:
+            yield video
+            count += 1
+            if (limit is not None and count >= limit) or (until and until(video)):
+                return
+
+
+def search_bilibili_videos(
+        keyword,
+        page_size,
+        data_mode,
+        *,
+        custom_start=None,              # ← 新增
+        custom_end=None,                # ← 新增
+        none_on_error=False
+):
+    """只抓第一页；请求失败时返回空列表，none_on_error 为真时返回 None（与“确实没有结果”区分）"""
+    pages = iter_bilibili_pages(
+        keyword,
+        page_size,
+        data_mode,
+        custom_start=custom_start,  # ← 终于传给工具函数
+        custom_end=custom_end,
+        max_pages=1
+    )
+    try:
+        return next(pages)
+    except StopIteration as stop:
+        return None if none_on_error and stop.value is False else []
 
 if __name__ == "__main__":
     videos = search_bilibili_videos("AI绘画", 5, "1d")
@@ -0,0 +1,148 @@
+"""bvid 的紧凑表示：BV 号与 av 号互转，以及按整数存储的去重集合。
+
+大规模抓取时用字符串 bvid 做去重，每条要占用一个 str 对象加一个 set 槽位；
+这里把 bvid 解码为 av 号（< 2**51），存进开放寻址的无符号 64 位数组，每条约 16 字节。
+无法解码的 bvid（格式异常）退化为 62 位哈希，与 av 号的取值范围互不重叠。
+"""
+import hashlib
+import math
+from array import array
+
+XOR_CODE = 23442827791579
+MASK_CODE = 2251799813685247
+MAX_AID = 1 << 51
+BASE = 58
+ALPHABET = "FcwAPNKTMug3GV5Lj7EJnHpWsx4tb8haYeviqBz6rkCy12mUSDQX9RdoZf"
+_INDEX = {c: i for i, c in enumerate(ALPHABET)}
+_HASHED = 1 << 62
+_MASK64 = (1 << 64) - 1
+
+
+def _swap(chars):
+    chars[3], chars[9] = chars[9], chars[3]
+    chars[4], chars[7] = chars[7], chars[4]
+
+
+def bv2av(bvid: str) -> int:
+    """BV1L9Uoa9EUx -> 111298867365120；格式不对时抛出 ValueError"""
+    if len(bvid) != 12 or not bvid.startswith("BV1"):
+        raise ValueError(f"无效的 bvid: {bvid!r}")
+    chars = list(bvid)
+    _swap(chars)
+    tmp = 0
+    for c in chars[3:]:
+        try:
+            tmp = tmp * BASE + _INDEX[c]
+        except KeyError:
+            raise ValueError(f"无效的 bvid: {bvid!r}") from None
+    return (tmp & MASK_CODE) ^ XOR_CODE
+
+
+def av2bv(aid: int) -> str:
+    chars = ["B", "V", "1"] + ["0"] * 9
+    tmp = (MAX_AID | aid) ^ XOR_CODE
+    for i in range(len(chars) - 1, 2, -1):
+        chars[i] = ALPHABET[tmp % BASE]
+        tmp //= BASE
+    _swap(chars)
+    return "".join(chars)
+
+
+def encode(bvid: str) -> int:
+    """bvid -> 非零整数键：能解码的用 av 号，否则用带标记位的 62 位哈希"""
+    try:
+        return bv2av(bvid)
+    except ValueError:
+        h = int.from_bytes(hashlib.blake2b(bvid.encode("utf-8"), digest_size=8).digest(), "big")
+        return _HASHED | (h >> 2)
+
+
+def _mix(x: int) -> int:
+    """splitmix64 终混函数，把相近的 av 号打散"""
+    x = (x ^ (x >> 30)) * 0xBF58476D1CE4E5B9 & _MASK64
+    x = (x ^ (x >> 27)) * 0x94D049BB133111EB & _MASK64
+    return x ^ (x >> 31)
+
+
+class BloomFilter:
+    """固定内存的近似集合：不会漏判已加入的 bvid，新 bvid 有 error_rate 的概率被误判为已存在"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: int):
+        h1 = _mix(key)
+        h2 = _mix(h1 ^ 0x9E3779B97F4A7C15) | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def _has(self, key: int) -> bool:
+        bits = self._bits
+        return all(bits[p >> 3] >> (p & 7) & 1 for p in self._positions(key))
+
+    def _add(self, key: int) -> bool:
+        bits, new = self._bits, False
+        for p in self._positions(key):
+            if not bits[p >> 3] >> (p & 7) & 1:
+                bits[p >> 3] |= 1 << (p & 7)
+                new = True
+        return new
+
+    def __contains__(self, bvid: str) -> bool:
+        return self._has(encode(bvid))
+
+    def add(self, bvid: str) -> bool:
+        """加入 bvid；之前（可能）已存在时返回 False"""
+        return self._add(encode(bvid))
+
+
+class BvidSet:
+    """精确的 bvid 集合，以整数键线性探测存储，负载超过一半时扩容。
+
+    bloom 给出时作为前置过滤：布隆过滤器判定为新的 bvid 不必再探测主表。
+    """
+
+    def __init__(self, capacity: int = 1024, bloom: BloomFilter | None = None):
+        self._bits = max(4, (capacity * 2 - 1).bit_length())
+        self._table = array("Q", bytes(8 << self._bits))
+        self._len = 0
+        self.bloom = bloom
+
+    def __len__(self):
+        return self._len
+
+    def _slot(self, key: int) -> int:
+        table, shift = self._table, 64 - self._bits
+        mask = (1 << self._bits) - 1
+        i = _mix(key) >> shift
+        while table[i] and table[i] != key:
+            i = (i + 1) & mask
+        return i
+
+    def __contains__(self, bvid: str) -> bool:
+        key = encode(bvid)
+        if self.bloom is not None and not self.bloom._has(key):
+            return False
+        return self._table[self._slot(key)] == key
+
+    def add(self, bvid: str) -> bool:
+        """加入 bvid；已存在时返回 False"""
+        key = encode(bvid)
+        # 布隆过滤器判定“可能已存在”时才需要查主表
+        if self.bloom is None or not self.bloom._add(key):
+            if self._table[self._slot(key)] == key:
+                return False
+        if (self._len + 1) * 2 > len(self._table):
+            self._grow()
+        self._table[self._slot(key)] = key
+        self._len += 1
+        return True
+
+    def _grow(self):
+        old = self._table
+        self._bits += 1
+        self._table = array("Q", bytes(8 << self._bits))
+        for key in old:
+            if key:
+                self._table[self._slot(key)] = key
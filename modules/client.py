@@ -0,0 +1,63 @@
+"""共享 HTTP 客户端：一个带连接池的 requests.Session，供搜索、推送和 WebUI 复用。
+
+B 站的 headers / cookies 在创建时写入会话，config.json 被修改（mtime 变化）后
+下一次请求前自动重新应用，无需重启进程。
+"""
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from modules import tool
+
+POOL_SIZE = 16          # 每个 host 保持的长连接数，应不小于并发请求数
+BILI_DOMAIN = ".bilibili.com"
+
+
+class BiliClient:
+    def __init__(self, config_file="config.json", pool_size=POOL_SIZE):
+        self.config_file = config_file
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._lock = threading.Lock()
+        self._applied = None    # 上次应用到会话的 config 对象
+
+    def _refresh(self):
+        config = tool.load_config(self.config_file)
+        if config is self._applied:
+            return
+        with self._lock:
+            if config is self._applied:
+                return
+            self.session.headers.clear()
+            self.session.headers.update(requests.utils.default_headers())
+            self.session.headers.update(config.get("headers", {}))
+            # cookies 只对 B 站域名生效，避免随 PushPlus 等请求外泄
+            self.session.cookies.clear()
+            for name, value in config.get("cookies", {}).items():
+                self.session.cookies.set(name, value, domain=BILI_DOMAIN)
+            self._applied = config
+
+    def get(self, url, **kwargs):
+        self._refresh()
+        return self.session.get(url, **kwargs)
+
+    def post(self, url, **kwargs):
+        self._refresh()
+        return self.session.post(url, **kwargs)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> BiliClient:
+    """返回进程内共享的 BiliClient（懒加载，线程安全）"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = BiliClient()
+    return _client
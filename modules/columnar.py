@@ -0,0 +1,52 @@
+"""搜索结果的列式表示：把一批 BiliVideo 的数值字段放进 NumPy 数组，
+阈值筛选用向量化掩码一次完成，而不是逐条 Python 循环。"""
+from typing import List
+
+import numpy as np
+
+from modules.bilibili_search import BiliVideo
+
+
+class VideoBatch:
+    """一批视频的列式视图。
+
+    play / like / favorites 为 int64 数组，videos[i] 为第 i 行对应的原对象
+    （标题、标签等文本字段通过下标回查，不复制）。
+    """
+    __slots__ = ("videos", "play", "like", "favorites")
+
+    def __init__(self, videos: List[BiliVideo]):
+        n = len(videos)
+        self.videos = videos
+        self.play = np.fromiter((v.play for v in videos), dtype=np.int64, count=n)
+        self.like = np.fromiter((v.like for v in videos), dtype=np.int64, count=n)
+        self.favorites = np.fromiter((v.favorites for v in videos), dtype=np.int64, count=n)
+
+    def __len__(self):
+        return len(self.videos)
+
+    def like_ratio(self) -> np.ndarray:
+        """赞 / 播放，播放量为 0 时记为 0"""
+        out = np.zeros(len(self), dtype=np.float64)
+        np.divide(self.like, self.play, out=out, where=self.play > 0)
+        return out
+
+    def mask(
+        self,
+        *,
+        min_play: int = 0,
+        min_like_ratio: float = 0,
+        min_favorites: int = 0,
+    ) -> np.ndarray:
+        """返回满足全部数值阈值的布尔掩码"""
+        m = self.play >= min_play
+        if min_like_ratio > 0:
+            m &= self.like_ratio() >= min_like_ratio
+        if min_favorites > 0:
+            m &= self.favorites >= min_favorites
+        return m
+
+    def take(self, mask: np.ndarray) -> List[BiliVideo]:
+        """按掩码取回对应的 BiliVideo 对象"""
+        videos = self.videos
+        return [videos[i] for i in np.flatnonzero(mask)]
@@ -0,0 +1,100 @@
+"""已推送记录（sent history）存储。
+
+使用带主键索引的 SQLite 表代替整体读写的 sent_history.json：
+- 成员判断走索引查询，不需要把全部历史读入内存；
+- 新记录只做追加插入（INSERT OR IGNORE），崩溃不会损坏已有数据；
+- 每条记录带推送时间戳，可按 TTL 清理过旧记录；
+- 首次打开时自动导入旧的 JSON 历史文件（只导入一次）；
+- 同库保存每个关键词的增量抓取水位线（已处理的最新发布时间）。
+"""
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+class HistoryStore:
+    def __init__(self, path, legacy_json=None):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sent ("
+                " bvid TEXT PRIMARY KEY, sent_at REAL NOT NULL) WITHOUT ROWID"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sent_at ON sent(sent_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS watermarks (keyword TEXT PRIMARY KEY, ts INTEGER NOT NULL)"
+            )
+        if legacy_json is not None:
+            self.migrate_json(legacy_json)
+
+    def __contains__(self, bvid) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM sent WHERE bvid = ?", (bvid,)).fetchone()
+        return row is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sent").fetchone()[0]
+
+    def add_many(self, bvids, sent_at=None):
+        """追加推送记录，已存在的 bvid 保留最初的推送时间"""
+        ts = time.time() if sent_at is None else sent_at
+        with self._lock, self._conn as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO sent (bvid, sent_at) VALUES (?, ?)",
+                ((b, ts) for b in bvids),
+            )
+
+    def compact(self, ttl_seconds) -> int:
+        """删除早于 ttl_seconds 之前推送的记录，返回删除条数"""
+        cutoff = time.time() - ttl_seconds
+        with self._lock, self._conn as conn:
+            return conn.execute("DELETE FROM sent WHERE sent_at < ?", (cutoff,)).rowcount
+
+    def watermarks(self) -> dict:
+        """返回 {关键词: 已处理的最新发布时间戳}"""
+        with self._lock:
+            return dict(self._conn.execute("SELECT keyword, ts FROM watermarks").fetchall())
+
+    def advance_watermarks(self, latest: dict):
+        """把各关键词的水位线推进到 latest 中的时间戳（只前进不后退）"""
+        with self._lock, self._conn as conn:
+            conn.executemany(
+                "INSERT INTO watermarks (keyword, ts) VALUES (?, ?)"
+                " ON CONFLICT(keyword) DO UPDATE SET ts = MAX(ts, excluded.ts)",
+                latest.items(),
+            )
+
+    def migrate_json(self, json_path) -> int:
+        """从旧版 JSON 列表导入历史（每个库只执行一次），返回导入条数"""
+        json_path = Path(json_path)
+        with self._lock:
+            done = self._conn.execute(
+                "SELECT 1 FROM meta WHERE key = 'migrated_json'"
+            ).fetchone()
+        if done or not json_path.exists():
+            return 0
+        try:
+            bvids = json.loads(json_path.read_text("utf-8"))
+        except Exception:
+            bvids = []
+        # 旧文件没有时间戳，统一记为文件修改时间
+        ts = json_path.stat().st_mtime
+        with self._lock, self._conn as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO sent (bvid, sent_at) VALUES (?, ?)",
+                ((b, ts) for b in bvids),
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('migrated_json', ?)", (str(json_path),)
+            )
+        return len(bvids)
+
+    def close(self):
+        self._conn.close()
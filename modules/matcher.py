@@ -0,0 +1,74 @@
+"""多模式关键词匹配（Aho-Corasick 自动机）。
+
+屏蔽词、白名单、必含词都编译成同一种自动机：无论词表多长，
+每段文本只需线性扫描一遍。匹配大小写不敏感，编译结果按词表内容缓存。
+"""
+from collections import deque
+from functools import lru_cache
+
+
+class KeywordMatcher:
+    __slots__ = ("_goto", "_fail", "_out")
+
+    def __init__(self, terms):
+        goto = [{}]     # 状态 -> {字符: 下一状态}
+        out = [None]    # 状态 -> 以该状态结尾的（最短）命中词
+        for term in terms:
+            state = 0
+            for ch in term:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append(None)
+                state = nxt
+            out[state] = out[state] or term
+
+        # BFS 构建失败指针，并沿失败链继承命中词
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                if out[nxt] is None:
+                    out[nxt] = out[fail[nxt]]
+
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+
+    def find(self, text: str):
+        """返回 text 中最先出现的命中词，没有命中返回 None（text 需已转小写）"""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state] is not None:
+                return out[state]
+        return None
+
+    def matches(self, text: str) -> bool:
+        return self.find(text) is not None
+
+
+@lru_cache(maxsize=64)
+def _compile(terms: tuple) -> KeywordMatcher:
+    return KeywordMatcher(terms)
+
+
+def compile_terms(terms):
+    """把词表编译为 KeywordMatcher（转小写、去空、去重），词表为空时返回 None"""
+    if not terms:
+        return None
+    normalized = tuple(sorted({t.lower() for t in terms if t}))
+    if not normalized:
+        return None
+    return _compile(normalized)
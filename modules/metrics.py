@@ -0,0 +1,190 @@
+"""轻量级运行指标：计数器、耗时分布和逐请求事件，按次运行导出。
+
+    from modules.metrics import metrics
+    with metrics.timer("push_seconds"):
+        ...
+    metrics.incr("search_results_total", 40, keyword="mygo")
+    metrics.export_json("run_trace.json")          # 结构化 JSON 记录
+    metrics.export_prometheus("bilidream.prom")    # Prometheus 文本格式（node_exporter textfile）
+
+所有方法线程安全。耗时分布按序列只保存计数、总和、最值和固定大小的蓄水池样本，
+内存不随记录次数增长；常驻进程用 rotate() 按周期导出并清零。
+"""
+import json
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+MAX_EVENTS = 10_000
+RESERVOIR_SIZE = 1024       # 每个耗时序列保留的样本数，用于估算分位数
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _fmt_labels(labels):
+    if not labels:
+        return ""
+    inner = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " "))
+        for k, v in labels
+    )
+    return "{" + inner + "}"
+
+
+def _quantile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(q * len(sorted_values)))
+    return sorted_values[idx]
+
+
+class _Summary:
+    """单个序列的有界汇总：计数、总和、最值，以及蓄水池抽样（Algorithm R）的样本"""
+    __slots__ = ("count", "sum", "min", "max", "reservoir")
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+        self.reservoir = []
+
+    def add(self, value, rng):
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self.reservoir) < RESERVOIR_SIZE:
+            self.reservoir.append(value)
+        else:
+            i = rng.randrange(self.count)
+            if i < RESERVOIR_SIZE:
+                self.reservoir[i] = value
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rng = random.Random()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self._counters = {}
+            self._samples = {}
+            self._events = deque(maxlen=MAX_EVENTS)
+
+    def incr(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            summary = self._samples.get(key)
+            if summary is None:
+                summary = self._samples[key] = _Summary()
+            summary.add(value, self._rng)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0, **labels)
+
+    def event(self, name, **fields):
+        """记录一条带时间戳的事件（如单次请求的明细），用于 JSON 导出"""
+        fields["event"] = name
+        fields["ts"] = round(time.time(), 3)
+        with self._lock:
+            self._events.append(fields)
+
+    def counter(self, name, **labels):
+        with self._lock:
+            return self._counters.get(_key(name, labels), 0)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            timings = []
+            for (name, labels), summary in sorted(self._samples.items()):
+                s = sorted(summary.reservoir)
+                timings.append({
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": summary.count,
+                    "sum": summary.sum,
+                    "p50": _quantile(s, 0.5),
+                    "p99": _quantile(s, 0.99),
+                    "min": summary.min,
+                    "max": summary.max,
+                })
+            return {
+                "started": self.started,
+                "duration": time.time() - self.started,
+                "counters": counters,
+                "timings": timings,
+                "events": list(self._events),
+            }
+
+    def export_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+
+    def to_prometheus(self, prefix="bilidream_") -> str:
+        snap = self.snapshot()
+        lines = []
+        typed = set()
+        for c in snap["counters"]:
+            name = prefix + c["name"]
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{_fmt_labels(sorted(c['labels'].items()))} {c['value']}")
+        for t in snap["timings"]:
+            name = prefix + t["name"]
+            labels = sorted(t["labels"].items())
+            if name not in typed:
+                lines.append(f"# TYPE {name} summary")
+                typed.add(name)
+            for q in ("p50", "p99"):
+                quantile = "0.5" if q == "p50" else "0.99"
+                lines.append(f"{name}{_fmt_labels(labels + [('quantile', quantile)])} {t[q]}")
+            lines.append(f"{name}_sum{_fmt_labels(labels)} {t['sum']}")
+            lines.append(f"{name}_count{_fmt_labels(labels)} {t['count']}")
+        lines.append(f"# TYPE {prefix}run_duration_seconds gauge")
+        lines.append(f"{prefix}run_duration_seconds {snap['duration']}")
+        return "\n".join(lines) + "\n"
+
+    def export_prometheus(self, path, prefix="bilidream_"):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus(prefix))
+
+    def rotate(self, max_age=None, json_path=None, prom_path=None) -> bool:
+        """导出到给定路径后清零；max_age 给出时只有本周期已超过 max_age 秒才执行。
+
+        供调度器、WebUI 等常驻进程按周期调用，避免按标签累积的序列无限增多。
+        返回是否执行了清零。
+        """
+        if max_age is not None and time.time() - self.started < max_age:
+            return False
+        if json_path:
+            self.export_json(json_path)
+        if prom_path:
+            self.export_prometheus(prom_path)
+        self.reset()
+        return True
+
+
+metrics = Metrics()  # 进程内共享实例
@@ -0,0 +1,136 @@
+"""近似重复检测：对规范化后的标题（+ 标签）计算 64 位 SimHash，
+用于识别换标题搬运、切片号等与已推送视频几乎相同的稿件。
+
+索引保存在与推送历史相同的 SQLite 文件中（simhash 表）。64 位指纹切成 4 段
+各 16 位并分别建索引：汉明距离不超过 3 的两个指纹至少有一段完全相同（鸽巢原理），
+因此查询只需按段做等值查找，再对少量候选计算汉明距离，无需与全部历史逐一比较。
+短标题的特征太少，不同视频的指纹也容易相近，只把指纹完全相同的视为重复。
+"""
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Iterable, Iterator
+
+from modules.bilibili_search import BiliVideo
+
+BANDS = 4
+BAND_BITS = 64 // BANDS
+MAX_DISTANCE = 3            # 不能超过 BANDS - 1，否则分段查找会漏检
+SHINGLE = 3
+SHORT_TITLE = 8             # 规范化后不足该长度的标题只按距离 0 判重
+TAG_WEIGHT = 0.5
+
+# 搬运号常加的标注词，与画质/字幕说明一起去掉后再比较
+_NOISE = re.compile(r"搬运|转载|授权|中字|熟肉|生肉|字幕|高清|超清|蓝光|完整版|\d{3,4}p|4k|60帧|60fps")
+_NON_WORD = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def normalize_title(title: str) -> str:
+    text = unicodedata.normalize("NFKC", title).lower()
+    return _NOISE.sub("", _NON_WORD.sub("", text))
+
+
+def _features(v: BiliVideo, include_author=False):
+    title = normalize_title(v.title)
+    if len(title) <= SHINGLE:
+        yield title, 1.0
+    else:
+        for i in range(len(title) - SHINGLE + 1):
+            yield title[i:i + SHINGLE], 1.0
+    for tag in filter(None, (t.strip().lower() for t in v.tag.split(","))):
+        yield "#" + tag, TAG_WEIGHT
+    if include_author and v.author:
+        yield "@" + v.author.lower(), 1.0
+
+
+def simhash(v: BiliVideo, include_author=False) -> int:
+    acc = [0.0] * 64
+    for feature, weight in _features(v, include_author):
+        h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            acc[bit] += weight if h >> bit & 1 else -weight
+    return sum(1 << bit for bit in range(64) if acc[bit] > 0)
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def _signed(x: int) -> int:
+    """SQLite INTEGER 是有符号 64 位"""
+    return x - (1 << 64) if x >= 1 << 63 else x
+
+
+def _bands(h: int):
+    mask = (1 << BAND_BITS) - 1
+    return [h >> (i * BAND_BITS) & mask for i in range(BANDS)]
+
+
+class NearDupIndex:
+    def __init__(self, path, max_distance=MAX_DISTANCE, include_author=False):
+        if max_distance >= BANDS:
+            raise ValueError(f"max_distance 不能超过 {BANDS - 1}")
+        self.max_distance = max_distance
+        self.include_author = include_author
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS simhash ("
+                " bvid TEXT PRIMARY KEY, hash INTEGER NOT NULL,"
+                + "".join(f" b{i} INTEGER NOT NULL," for i in range(BANDS))
+                + " title TEXT, added REAL NOT NULL)"
+            )
+            for i in range(BANDS):
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_simhash_b{i} ON simhash(b{i})")
+
+    def _hash(self, v: BiliVideo) -> int:
+        return simhash(v, self.include_author)
+
+    def _limit(self, v: BiliVideo) -> int:
+        return 0 if len(normalize_title(v.title)) < SHORT_TITLE else self.max_distance
+
+    def _lookup(self, h: int):
+        where = " OR ".join(f"b{i} = ?" for i in range(BANDS))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT bvid, hash FROM simhash WHERE {where}", _bands(h)
+            ).fetchall()
+        return [(bvid, other & ((1 << 64) - 1)) for bvid, other in rows]
+
+    def find(self, v: BiliVideo):
+        """返回与 v 近似重复的已收录 bvid（同一 bvid 不算），没有返回 None"""
+        h, limit = self._hash(v), self._limit(v)
+        for bvid, other in self._lookup(h):
+            if bvid != v.bvid and hamming(h, other) <= limit:
+                return bvid
+        return None
+
+    def add_many(self, videos: Iterable[BiliVideo]):
+        now = time.time()
+        rows = []
+        for v in videos:
+            h = self._hash(v)
+            rows.append((v.bvid, _signed(h), *_bands(h), v.title, now))
+        placeholders = ", ".join("?" * (BANDS + 4))
+        with self._lock, self._conn as conn:
+            conn.executemany(f"INSERT OR REPLACE INTO simhash VALUES ({placeholders})", rows)
+
+    def iter_unique(self, videos: Iterable[BiliVideo]) -> Iterator[BiliVideo]:
+        """惰性跳过与已收录视频或本批中更早出现的视频近似重复的条目"""
+        seen = []
+        for v in videos:
+            if self.find(v):
+                continue
+            h, limit = self._hash(v), self._limit(v)
+            if any(hamming(h, k) <= limit for k in seen):
+                continue
+            seen.append(h)
+            yield v
+
+    def close(self):
+        self._conn.close()
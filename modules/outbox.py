@@ -0,0 +1,177 @@
+"""推送发件箱：消息先落盘，再由有限的工作线程投递，失败按退避重试。
+
+- 消息写入 SQLite 后才开始投递，进程崩溃或推送失败都不会丢内容；
+- deliver() 用有界线程池并发投递，每个推送端点有独立的令牌桶限速；
+- 失败的消息按指数退避安排下次重试，超过 max_attempts 标记为 dead；
+- 只有投递成功的消息才把其中的 bvid 写入对应的历史库（HistoryStore），随后从发件箱删除；
+  dead 消息留作排查，由 compact(max_age) 按保留期清理。
+
+多个进程可共享同一个发件箱：取消息时先加租约（lease），避免重复投递。
+"""
+import json
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from modules.history import HistoryStore
+from modules.metrics import metrics
+from modules.ratelimit import TokenBucket
+
+MAX_ATTEMPTS = 8
+BACKOFF_BASE = 30.0         # 秒，第 n 次失败后等待约 BACKOFF_BASE * 2**n
+BACKOFF_MAX = 3600.0
+LEASE = 120.0               # 取出后多长时间内其他投递者不会再取到它
+
+
+class Outbox:
+    def __init__(self, path, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False,
+                                     isolation_level=None)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS outbox ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " endpoint TEXT NOT NULL, token TEXT NOT NULL,"
+                " title TEXT NOT NULL, content TEXT NOT NULL,"
+                " bvids TEXT NOT NULL, history TEXT,"
+                " status TEXT NOT NULL DEFAULT 'pending',"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " next_at REAL NOT NULL, created REAL NOT NULL, last_error TEXT)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_due ON outbox(status, next_at)")
+
+    def enqueue(self, endpoint, token, title, content, bvids, history=None) -> int:
+        """写入一条待投递消息；history 为投递成功后要记录 bvid 的历史库路径"""
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO outbox (endpoint, token, title, content, bvids, history, next_at, created)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (endpoint, token, title, content, json.dumps(list(bvids)),
+                 str(history) if history else None, now, now),
+            )
+        metrics.incr("outbox_enqueued_total")
+        return cur.lastrowid
+
+    def pending_bvids(self, history=None) -> set:
+        """尚未投递成功（pending）的消息里包含的 bvid，用于避免重复选题"""
+        sql = "SELECT bvids FROM outbox WHERE status = 'pending'"
+        args = ()
+        if history is not None:
+            sql += " AND history = ?"
+            args = (str(history),)
+        with self._lock:
+            rows = self._conn.execute(sql, args).fetchall()
+        return {b for (raw,) in rows for b in json.loads(raw)}
+
+    def claim(self, limit=100, lease=LEASE) -> list:
+        """取出到期的消息并加租约"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT id, endpoint, token, title, content, bvids, history, attempts FROM outbox"
+                    " WHERE status = 'pending' AND next_at <= ? ORDER BY id LIMIT ?",
+                    (now, limit),
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE outbox SET next_at = ? WHERE id = ?",
+                    [(now + lease, r[0]) for r in rows],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        keys = ("id", "endpoint", "token", "title", "content", "bvids", "history", "attempts")
+        return [dict(zip(keys, r), bvids=json.loads(r[5])) for r in rows]
+
+    def ack(self, msg_id):
+        """投递成功：bvid 已记入历史库，消息本身不再需要"""
+        with self._lock:
+            self._conn.execute("DELETE FROM outbox WHERE id = ?", (msg_id,))
+
+    def fail(self, msg_id, attempts, error):
+        """记录一次失败：安排带抖动的指数退避重试，超过次数上限则标记为 dead"""
+        attempts += 1
+        if attempts >= self.max_attempts:
+            status, next_at = "dead", time.time()
+        else:
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1))
+            status, next_at = "pending", time.time() + random.uniform(delay / 2, delay)
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET status = ?, attempts = ?, next_at = ?, last_error = ? WHERE id = ?",
+                (status, attempts, next_at, str(error)[:500], msg_id),
+            )
+
+    def compact(self, max_age) -> int:
+        """删除标记为 dead 超过 max_age 秒的消息（及旧版本留下的 sent 记录），返回删除条数"""
+        cutoff = time.time() - max_age
+        with self._lock:
+            return self._conn.execute(
+                "DELETE FROM outbox WHERE status = 'sent' OR (status = 'dead' AND next_at < ?)",
+                (cutoff,),
+            ).rowcount
+
+    def counts(self) -> dict:
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+
+    def deliver(self, send, *, workers=4, rate_per_endpoint=1.0, limit=100) -> dict:
+        """投递所有到期消息，返回 {"sent": n, "failed": n}
+
+        Args:
+            send: send(endpoint, token, title, content) -> bool，True 表示投递成功。
+            workers: 并发投递的线程数。
+            rate_per_endpoint: 每个端点每秒最多投递的条数。
+        """
+        messages = self.claim(limit)
+        if not messages:
+            return {"sent": 0, "failed": 0}
+
+        buckets = {m["endpoint"]: TokenBucket(rate_per_endpoint, 1) for m in messages}
+        histories = {}
+        hist_lock = threading.Lock()
+        result = {"sent": 0, "failed": 0}
+
+        def _history(path):
+            with hist_lock:
+                if path not in histories:
+                    histories[path] = HistoryStore(path)
+                return histories[path]
+
+        def _one(m):
+            buckets[m["endpoint"]].acquire()
+            try:
+                ok = send(m["endpoint"], m["token"], m["title"], m["content"])
+                error = None if ok else "push rejected"
+            except Exception as e:
+                ok, error = False, e
+            if ok:
+                if m["history"]:
+                    _history(m["history"]).add_many(m["bvids"])
+                self.ack(m["id"])
+                metrics.incr("outbox_delivered_total")
+            else:
+                self.fail(m["id"], m["attempts"], error)
+                metrics.incr("outbox_failed_total")
+            with hist_lock:
+                result["sent" if ok else "failed"] += 1
+
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, min(workers, len(messages)))) as pool:
+                list(pool.map(_one, messages))
+        finally:
+            for h in histories.values():
+                h.close()
+        return result
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,115 @@
+"""内存有界的流式检索流水线：抓取 → 解析 → 过滤 → 去重 → 排序/输出。
+
+各阶段之间只传递一页结果：抓取线程把解析好的页放进有界队列，消费方逐页过滤、
+去重后产出，未通过筛选的原始结果随即释放。常驻内存的只有队列中的若干页、
+紧凑的 bvid 去重集合（见 modules.bvid）、尚未轮到输出的关键词已通过筛选的视频，
+以及调用方保留的最终结果。输出顺序与逐个关键词串行抓取时相同，不受抓取快慢影响。
+"""
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Tuple
+
+from modules.bilibili_search import BiliVideo, iter_bilibili_pages
+from modules.bvid import BloomFilter, BvidSet
+
+MAX_IN_FLIGHT = 4
+BUFFER_PAGES = 8            # 已抓取、尚未被消费的页数上限
+
+
+def iter_pages(
+        keywords: List[str],
+        page_size: int,
+        data_mode: str,
+        *,
+        custom_start=None,
+        custom_end=None,
+        max_pages: int | None = 1,
+        max_in_flight: int | None = None,
+        buffer_pages: int = BUFFER_PAGES,
+) -> Iterator[Tuple[int, List[BiliVideo] | None]]:
+    """并发逐页抓取多个关键词，按完成先后产出 (关键词序号, 页)。
+
+    同一关键词的页按页码顺序产出，翻完后产出 (序号, None) 作为结束标记。
+    每个关键词由一个线程翻页；队列满时抓取线程阻塞，因此消费方处理不过来时
+    内存中最多只有 buffer_pages + max_in_flight 页原始结果。调用方停止迭代后
+    不再请求新的页。
+    """
+    pages = queue.Queue(maxsize=max(1, buffer_pages))
+    stop = threading.Event()
+
+    def crawl(i, kw):
+        try:
+            if stop.is_set():
+                return
+            it = iter_bilibili_pages(
+                kw,
+                page_size,
+                data_mode,
+                custom_start=custom_start,
+                custom_end=custom_end,
+                max_pages=max_pages,
+            )
+            while not stop.is_set():        # 每次 next() 才会请求下一页
+                page = next(it, None)
+                if page is None:
+                    return
+                pages.put((i, page))
+        except Exception as e:      # 单个关键词出错不影响其他关键词
+            print(f"[{kw}] 抓取出错:", e)
+        finally:
+            pages.put((i, None))
+
+    workers = max(1, min(max_in_flight or MAX_IN_FLIGHT, len(keywords) or 1))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for i, kw in enumerate(keywords):
+            pool.submit(crawl, i, kw)
+        remaining = len(keywords)
+        try:
+            while remaining:
+                item = pages.get()
+                if item[1] is None:
+                    remaining -= 1
+                yield item
+        finally:
+            stop.set()
+            while remaining:        # 让阻塞在 put 上的抓取线程退出
+                if pages.get()[1] is None:
+                    remaining -= 1
+
+
+def run(
+        pages: Iterable[Tuple[int, List[BiliVideo] | None]],
+        accept: Callable[[List[BiliVideo]], List[BiliVideo]] | None = None,
+        *,
+        bloom_capacity: int | None = None,
+) -> Iterator[BiliVideo]:
+    """逐页过滤（accept），按关键词顺序去重并产出首次出现的视频。
+
+    pages 为 iter_pages 的输出。当前关键词的结果边到边产出；后面关键词先到的页
+    过滤后暂存，等前面的关键词都翻完再依次输出——暂存的只有通过筛选的视频。
+    因此结果顺序（及重复视频归属的关键词）与抓取快慢无关。
+    bloom_capacity 给出时在去重集合前加一层布隆过滤器，大多数新 bvid 不必探测主表。
+    """
+    seen = BvidSet(bloom=BloomFilter(bloom_capacity) if bloom_capacity else None)
+    pending = {}        # 关键词序号 -> 暂存的已通过筛选视频
+    done = set()
+    current = 0
+
+    def emit(videos):
+        for v in videos:
+            if seen.add(v.bvid):
+                yield v
+
+    for i, page in pages:
+        if page is None:
+            done.add(i)
+            while current in done:
+                current += 1
+                yield from emit(pending.pop(current, ()))
+            continue
+        batch = accept(page) if accept is not None else page
+        if i == current:
+            yield from emit(batch)
+        else:
+            pending.setdefault(i, []).extend(batch)
@@ -0,0 +1,98 @@
+"""按评分选出前 K 条视频，替代 random.shuffle + 切片的随机选择。
+
+评分为几项归一化指标的加权和：
+- like_ratio      赞 / 播放（以 LIKE_RATIO_REF 为满分）
+- favorite_ratio  收藏 / 播放（以 FAVORITE_RATIO_REF 为满分）
+- play            log10(播放量)，以 PLAY_REF 为满分
+- recency         按半衰期 half_life_hours 指数衰减的新鲜度
+
+选取用堆完成，只有最终入选的 K 条会被完全排序；可选的多样性约束限制
+同一关键词 / 同一 UP 主最多入选几条，seed 用于打破同分并可加入少量随机扰动。
+"""
+import heapq
+import math
+import random
+import time
+from typing import Dict, List
+
+from modules.bilibili_search import BiliVideo
+
+DEFAULT_WEIGHTS = {"like_ratio": 1.0, "favorite_ratio": 0.6, "play": 0.4, "recency": 0.3}
+LIKE_RATIO_REF = 0.10
+FAVORITE_RATIO_REF = 0.05
+PLAY_REF = 6.0                  # log10(1,000,000)
+HALF_LIFE_HOURS = 72.0
+
+
+def score(v: BiliVideo, weights: Dict[str, float], now: float, half_life_hours=HALF_LIFE_HOURS) -> float:
+    play = v.play
+    like_ratio = min(v.like / play / LIKE_RATIO_REF, 1.5) if play else 0.0
+    fav_ratio = min(v.favorites / play / FAVORITE_RATIO_REF, 1.5) if play else 0.0
+    play_term = math.log10(1 + play) / PLAY_REF
+    if v.pubdate:
+        age_hours = max(0.0, now - v.pubdate) / 3600
+        recency = 0.5 ** (age_hours / half_life_hours)
+    else:
+        recency = 0.0
+    return (weights.get("like_ratio", 0) * like_ratio
+            + weights.get("favorite_ratio", 0) * fav_ratio
+            + weights.get("play", 0) * play_term
+            + weights.get("recency", 0) * recency)
+
+
+class Ranker:
+    """可调用的排序阶段：ranker(videos) -> 评分最高的至多 k 条（按分数降序）
+
+    Args:
+        k:            保留条数，None 表示全部排序。
+        weights:      各项指标的权重，缺省项取 DEFAULT_WEIGHTS。
+        per_keyword:  同一搜索关键词最多入选几条，None 为不限。
+        per_author:   同一 UP 主最多入选几条，None 为不限。
+        seed:         随机种子，决定同分时的先后以及 jitter 扰动。
+        jitter:       在评分上叠加 [0, jitter) 的随机扰动，让结果每次略有变化。
+    """
+
+    def __init__(self, k=None, *, weights=None, per_keyword=None, per_author=None,
+                 seed=None, jitter=0.0, half_life_hours=HALF_LIFE_HOURS):
+        self.k = k
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.per_keyword = per_keyword
+        self.per_author = per_author
+        self.seed = seed
+        self.jitter = jitter
+        self.half_life_hours = half_life_hours
+
+    def __call__(self, videos: List[BiliVideo]) -> List[BiliVideo]:
+        return top_k(self, videos)
+
+
+def top_k(ranker: Ranker, videos: List[BiliVideo]) -> List[BiliVideo]:
+    rng = random.Random(ranker.seed)
+    now = time.time()
+    k = len(videos) if ranker.k is None else ranker.k
+    if k <= 0 or not videos:
+        return []
+
+    def key(v):
+        return score(v, ranker.weights, now, ranker.half_life_hours) + rng.random() * ranker.jitter
+
+    entries = [(key(v), rng.random(), i) for i, v in enumerate(videos)]
+    if ranker.per_keyword is None and ranker.per_author is None:
+        return [videos[i] for _, _, i in heapq.nlargest(k, entries)]
+
+    # 有多样性约束时按分数从高到低逐个弹出，跳过已达上限的关键词 / UP 主
+    heap = [(-s, t, i) for s, t, i in entries]
+    heapq.heapify(heap)
+    per_kw, per_up, picked = {}, {}, []
+    while heap and len(picked) < k:
+        _, _, i = heapq.heappop(heap)
+        v = videos[i]
+        if ranker.per_keyword is not None and per_kw.get(v.keyword, 0) >= ranker.per_keyword:
+            continue
+        if ranker.per_author is not None and per_up.get(v.author, 0) >= ranker.per_author:
+            continue
+        per_kw[v.keyword] = per_kw.get(v.keyword, 0) + 1
+        per_up[v.author] = per_up.get(v.author, 0) + 1
+        picked.append(v)
+    return picked
+
@@ -0,0 +1,168 @@
+"""搜索请求的自适应限流：令牌桶 + AIMD 并发窗口 + 抖动重试 + 熔断。
+
+- TokenBucket：限制平均请求速率（rate 次/秒，允许 burst 次突发）；
+- AIMD：成功时并发窗口和速率缓慢线性上升，遇到风控（HTTP 412 / 非零 code）
+  时按比例快速下降，从而逼近不被拦截的最高可持续速率；
+- 重试：指数退避 + 全抖动（full jitter），避免多个线程同时重试；
+- 熔断：连续失败达到阈值后在 reset 秒内直接拒绝请求，之后放行一次试探。
+
+参数来自 config.json 的 "rate_limit" 段，进程内共享一个实例（见 get_limiter）。
+"""
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from modules import tool
+
+DEFAULTS = {
+    "rate": 4.0,                # 初始速率（次/秒）
+    "min_rate": 0.5,
+    "max_rate": 20.0,
+    "burst": 4,
+    "concurrency": 4,           # 初始并发窗口
+    "min_concurrency": 1,
+    "max_concurrency": 8,
+    "increase": 1.0,            # 每个"窗口"的成功请求带来的加性增长
+    "decrease": 0.5,            # 遇到风控时的乘性下降系数
+    "max_retries": 3,
+    "backoff_base": 1.0,        # 秒
+    "backoff_max": 30.0,
+    "breaker_threshold": 5,     # 连续失败多少次后熔断
+    "breaker_reset": 60.0,      # 熔断持续秒数
+}
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """取一个令牌，不够时阻塞等待"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    def __init__(self, threshold, reset_timeout):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._probing:
+                return False
+            self._probing = True        # 半开：放行一次试探请求
+            return True
+
+    def success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+
+    def release(self):
+        """结束半开试探但不计成败（如试探请求遇到非风控错误），之后可再次试探"""
+        with self._lock:
+            self._probing = False
+
+
+class AdaptiveLimiter:
+    def __init__(self, **conf):
+        c = {**DEFAULTS, **conf}
+        self.conf = c
+        self.max_retries = int(c["max_retries"])
+        self.bucket = TokenBucket(c["rate"], c["burst"])
+        self.breaker = CircuitBreaker(int(c["breaker_threshold"]), float(c["breaker_reset"]))
+        self.limit = float(c["concurrency"])
+        self._in_flight = 0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self):
+        """占用一个并发名额并取一个令牌，退出时释放名额"""
+        with self._cond:
+            while self._in_flight >= int(self.limit):
+                self._cond.wait()
+            self._in_flight += 1
+        try:
+            self.bucket.acquire()
+            yield
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify()
+
+    def on_success(self):
+        c = self.conf
+        with self._cond:
+            self.limit = min(c["max_concurrency"], self.limit + c["increase"] / max(self.limit, 1))
+            self.bucket.rate = min(c["max_rate"], self.bucket.rate + c["increase"] / max(self.bucket.rate, 1))
+            self._cond.notify_all()
+        self.breaker.success()
+
+    def on_throttle(self):
+        c = self.conf
+        with self._cond:
+            self.limit = max(c["min_concurrency"], self.limit * c["decrease"])
+            self.bucket.rate = max(c["min_rate"], self.bucket.rate * c["decrease"])
+        self.breaker.failure()
+
+    def on_error(self):
+        self.breaker.failure()
+
+    def backoff(self, attempt) -> float:
+        """第 attempt 次重试前的等待秒数（指数退避 + 全抖动）"""
+        c = self.conf
+        return random.uniform(0, min(c["backoff_max"], c["backoff_base"] * 2 ** attempt))
+
+    def state(self) -> dict:
+        return {
+            "concurrency": self.limit,
+            "rate": self.bucket.rate,
+            "in_flight": self._in_flight,
+            "breaker_open": self.breaker.is_open,
+        }
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter() -> AdaptiveLimiter:
+    """返回按 config.json "rate_limit" 段创建的共享限流器"""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = AdaptiveLimiter(**tool.load_config().get("rate_limit", {}))
+    return _limiter
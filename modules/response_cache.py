@@ -0,0 +1,151 @@
+"""搜索接口原始响应的磁盘缓存，WebUI 与 PushPlus 任务共享。
+
+基于 SQLite（WAL 模式）实现，多进程可同时读写：
+- 以规范化后的请求参数（关键词、页码、时间窗口等）作为键；
+- 每条记录有自己的过期时间（TTL）；
+- 总大小超过上限时按最近访问时间做 LRU 淘汰；
+- 命中 / 未命中次数持久化在库中，可跨进程统计。
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from modules import tool
+
+DEFAULT_PATH = ".cache/search_cache.sqlite3"
+DEFAULT_TTL = 600                   # 秒
+DEFAULT_MAX_MB = 64
+
+
+def make_key(params: dict) -> str:
+    """把请求参数规范化为稳定的缓存键"""
+    norm = {k: str(v).strip() for k, v in params.items()}
+    raw = json.dumps(norm, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0       # 本进程内的计数
+        self.misses = 0
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL,"
+                " expires REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON entries(accessed)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+            )
+            conn.execute("INSERT OR IGNORE INTO counters VALUES ('hits', 0), ('misses', 0)")
+
+    def _conn(self):
+        # sqlite 连接不能跨线程共享，每个线程各持一个
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, conn, name):
+        conn.execute("UPDATE counters SET value = value + 1 WHERE name = ?", (name,))
+
+    def get(self, params: dict):
+        """返回缓存的响应，不存在或已过期时返回 None"""
+        key = make_key(params)
+        now = time.time()
+        with self._conn() as conn:
+            row = conn.execute(
+                "SELECT value, expires FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                if row is not None:
+                    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._count(conn, "misses")
+                self.misses += 1
+                return None
+            conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            self._count(conn, "hits")
+        self.hits += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def set(self, params: dict, data, ttl=None):
+        """写入一条响应，ttl 为 None 时使用默认 TTL"""
+        key = make_key(params)
+        blob = zlib.compress(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+        now = time.time()
+        expires = now + (self.ttl if ttl is None else ttl)
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                (key, blob, len(blob), expires, now),
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM entries WHERE expires <= ?", (now,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # 按最近访问时间从旧到新淘汰，直到回到上限以内
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed").fetchall():
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self) -> dict:
+        """命中统计：total_* 为所有进程累计值，hits/misses 为本进程值"""
+        conn = self._conn()
+        counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        entries, size = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        total = counters["hits"] + counters["misses"]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "total_hits": counters["hits"],
+            "total_misses": counters["misses"],
+            "hit_rate": counters["hits"] / total if total else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def clear(self):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM entries")
+            conn.execute("UPDATE counters SET value = 0")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """按 config.json 的 "cache" 段返回共享缓存；未启用时返回 None"""
+    global _cache
+    conf = tool.load_config().get("cache", {})
+    if not conf.get("enabled", True):
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache(
+                    tool.config_path(conf.get("path", DEFAULT_PATH)),
+                    ttl=conf.get("ttl", DEFAULT_TTL),
+                    max_bytes=int(conf.get("max_mb", DEFAULT_MAX_MB) * 1024 * 1024),
+                )
+    return _cache
@@ -0,0 +1,93 @@
+"""时间窗口分片：把很长的发布时间范围拆成若干子窗口并发抓取。
+
+搜索接口对单次查询最多只能翻 PAGE_CAP 页、RESULT_CAP 条，"1y" 或跨度很大的
+custom 窗口里大部分结果根本翻不到。规划器先按 shard_seconds（默认不预切，
+整个窗口作为一个分片）切分，对每个分片请求第一页：若结果数达到上限且分片
+仍可再分，就二分后分别重新探测（按结果密度自适应）；否则把剩余页并发抓完。
+稀疏的时间段只花一次请求，密集的时间段被细分到每片都能翻完。
+"""
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterator, List, Tuple
+
+from modules.bilibili_search import BiliVideo, build_params, fetch_page, parse_videos
+from modules.metrics import metrics
+import modules.tool as tool
+
+PAGE_CAP = 50               # 单次查询最多可翻页数
+RESULT_CAP = 1000           # 单次查询最多可取结果数
+MIN_SHARD_SECONDS = 3600    # 分片不再细分的最小跨度
+MAX_IN_FLIGHT = 4
+DAY = 86400
+
+
+def split_range(time_range: dict, shard_seconds: int) -> List[dict]:
+    """按固定跨度切分 {start_ts, end_ts}（闭区间），最后一片可能较短"""
+    start, end = time_range["start_ts"], time_range["end_ts"]
+    shards = []
+    while start <= end:
+        stop = min(start + shard_seconds - 1, end)
+        shards.append({"start_ts": start, "end_ts": stop})
+        start = stop + 1
+    return shards
+
+
+def bisect(shard: dict) -> Tuple[dict, dict]:
+    mid = (shard["start_ts"] + shard["end_ts"]) // 2
+    return {"start_ts": shard["start_ts"], "end_ts": mid}, {"start_ts": mid + 1, "end_ts": shard["end_ts"]}
+
+
+def reachable(page_size: int) -> int:
+    """单个查询实际能取到的最多结果数"""
+    return min(RESULT_CAP, PAGE_CAP * page_size)
+
+
+def is_capped(data: dict, page_size: int) -> bool:
+    total = data.get("numResults") or 0
+    return total >= reachable(page_size) or (data.get("numPages") or 0) > PAGE_CAP
+
+
+def iter_shard_pages(
+        keywords: List[str],
+        page_size: int,
+        data_mode: str,
+        *,
+        custom_start=None,
+        custom_end=None,
+        shard_seconds: int | None = None,
+        min_shard_seconds: int = MIN_SHARD_SECONDS,
+        max_in_flight: int | None = None,
+) -> Iterator[Tuple[str, dict, List[BiliVideo]]]:
+    """按完成先后逐页 yield (关键词, 分片, 该页 BiliVideo)，不去重。
+
+    同时在途的请求不超过 max_in_flight；调用方停止迭代后不再提交新请求。
+    被二分的分片，其第一页结果仍会产出（由调用方去重）。
+    """
+    time_range = tool.get_time_range(data_mode, custom_start=custom_start, custom_end=custom_end)
+    shards = split_range(time_range, shard_seconds) if shard_seconds else [time_range]
+    queue = deque((kw, shard, 1) for kw in keywords for shard in shards)
+    workers = max(1, max_in_flight or MAX_IN_FLIGHT)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        running = {}
+        while queue or running:
+            while queue and len(running) < workers:
+                kw, shard, page = task = queue.popleft()
+                running[pool.submit(fetch_page, build_params(kw, page, page_size, shard))] = task
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                kw, shard, page = running.pop(fut)
+                data = fut.result()
+                if data is None:
+                    metrics.incr("shard_failed_total")
+                    continue
+                if page == 1:
+                    span = shard["end_ts"] - shard["start_ts"] + 1
+                    if is_capped(data, page_size) and span > min_shard_seconds:
+                        metrics.incr("shard_splits_total")
+                        queue.extend((kw, half, 1) for half in bisect(shard))
+                    else:
+                        last = min(data.get("numPages") or 0, PAGE_CAP)
+                        if len(data.get("result") or []) >= page_size:
+                            queue.extend((kw, shard, n) for n in range(2, last + 1))
+                yield kw, shard, parse_videos(data, kw)
@@ -0,0 +1,67 @@
+"""进程内请求合并（single-flight）。
+
+多个线程（如 Streamlit 的多个会话）同时请求同一个 key 时，只有第一个线程真正
+执行，其余线程等待并共享它的结果（或异常）。调用结束后 key 即被移除，
+之后的请求会重新执行——这里只合并“同时在途”的请求，结果的复用交给缓存层。
+"""
+import threading
+
+from modules.metrics import metrics
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, name="singleflight"):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        """执行 fn(*args, **kwargs)；同一 key 已在执行中时等待并返回同一个结果"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.followers += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+                leader = True
+        metrics.incr(f"{self.name}_calls_total", role="leader" if leader else "follower")
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def coalescing_rate(self) -> float:
+        """被合并掉的调用占全部调用的比例"""
+        with self._lock:
+            total = self.leaders + self.followers
+            return self.followers / total if total else 0.0
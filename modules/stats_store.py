@@ -0,0 +1,234 @@
+"""视频数据快照的时序存储：每次抓取时记录 (bvid, 时间, 播放, 点赞, 收藏)，
+用于计算一段时间内的增长速度（如每小时新增点赞），找出正在快速上涨的视频。
+
+磁盘上是一个只追加的定长记录文件，任何进程写入时都是整条追加，读取方按字节偏移
+增量加载新记录，因此 WebUI 与推送任务可以同时写入同一个文件。写入只追加、不读文件；
+第一次查询时才把文件读入内存，按列保存为 NumPy 数组，bvid 映射为整数 id——
+只记录不查询的进程不付出这部分内存。查询时按 (id, 时间) 排好的复合键二分查找，
+一次向量化地得到每个视频在时间窗口内的首尾快照。
+
+过期快照由写入方清理：ingest 时（每进程每 COMPACT_CHECK_SECONDS 秒最多一次）查看
+文件中最早的快照，超出保留期 COMPACT_SLACK 后重写文件。追加与重写都持有数据文件的
+排他锁（fcntl.flock），重写先写同目录下的唯一临时文件再原子替换，并发追加不会丢失。
+"""
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from modules import tool
+
+try:
+    import fcntl
+except ImportError:         # Windows 没有 flock：单进程写入不受影响，多进程并发重写时可能丢记录
+    fcntl = None
+
+DEFAULT_PATH = ".cache/stats.bin"
+DEFAULT_RETENTION_DAYS = 30
+RECORD = np.dtype([
+    ("bvid", "S16"),
+    ("ts", "<i8"),
+    ("play", "<i8"),
+    ("like", "<i8"),
+    ("favorites", "<i8"),
+])
+COLUMNS = ("id", "ts", "play", "like", "favorites")
+_TS_BITS = 40               # 复合键低 40 位放时间戳，足够到公元 36000 年
+COMPACT_CHECK_SECONDS = 3600
+COMPACT_SLACK = 0.1         # 最早的快照超出保留期的比例，超过后才重写文件
+
+
+class StatsStore:
+    def __init__(self, path, retention_seconds=None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.touch(exist_ok=True)
+        self.retention_seconds = retention_seconds
+        self._lock = threading.Lock()
+        self._checked = 0.0         # 上次检查是否需要清理的时间
+        self._reset()
+
+    def _reset(self):
+        self._ids = {}              # bvid -> id
+        self._cols = {name: np.empty(1024, dtype=np.int64) for name in COLUMNS}
+        self._n = 0
+        self._offset = 0
+        self._inode = None
+        self._sorted = None         # (复合键, 行号)，追加后失效
+
+    def __len__(self):
+        with self._lock:
+            self._load()
+            return self._n
+
+    def _load(self):
+        """读入文件中自上次以来新追加的完整记录；文件被 compact 替换时整体重载"""
+        with open(self.path, "rb") as f:
+            st = os.fstat(f.fileno())       # 以打开的文件为准，不会读到替换了一半的状态
+            if st.st_ino != self._inode or st.st_size < self._offset:
+                self._reset()
+                self._inode = st.st_ino
+            usable = (st.st_size - self._offset) // RECORD.itemsize * RECORD.itemsize
+            if not usable:
+                return
+            f.seek(self._offset)
+            recs = np.frombuffer(f.read(usable), dtype=RECORD)
+        self._offset += usable
+        self._append(recs)
+
+    def _open_locked(self, mode):
+        """打开数据文件并加排他锁（关闭时释放）；等锁期间文件被其他进程替换时重新打开"""
+        while True:
+            f = open(self.path, mode)
+            if fcntl is None:
+                return f
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                if os.fstat(f.fileno()).st_ino == os.stat(self.path).st_ino:
+                    return f
+            except FileNotFoundError:
+                pass
+            f.close()
+
+    def _append(self, recs):
+        n, m = self._n, len(recs)
+        cap = len(self._cols["id"])
+        if n + m > cap:
+            cap = max(cap * 2, n + m)
+            for name, col in self._cols.items():
+                grown = np.empty(cap, dtype=np.int64)
+                grown[:n] = col[:n]
+                self._cols[name] = grown
+        ids = self._ids
+        self._cols["id"][n:n + m] = np.fromiter(
+            (ids.setdefault(b.decode(), len(ids)) for b in recs["bvid"]), dtype=np.int64, count=m
+        )
+        for name in COLUMNS[1:]:
+            self._cols[name][n:n + m] = recs[name]
+        self._n = n + m
+        self._sorted = None
+
+    def _index(self):
+        if self._sorted is None:
+            n = self._n
+            keys = (self._cols["id"][:n] << _TS_BITS) + self._cols["ts"][:n]
+            order = np.argsort(keys, kind="stable")
+            self._sorted = keys[order], order
+        return self._sorted
+
+    def ingest(self, videos, ts=None):
+        """追加一批视频的当前数据（同一批内重复的 bvid 只记一次）"""
+        unique = {v.bvid: v for v in videos if v.bvid}
+        if not unique:
+            return 0
+        recs = np.empty(len(unique), dtype=RECORD)
+        recs["bvid"] = [b.encode() for b in unique]
+        recs["ts"] = int(ts if ts is not None else time.time())
+        recs["play"] = [v.play for v in unique.values()]
+        recs["like"] = [v.like for v in unique.values()]
+        recs["favorites"] = [v.favorites for v in unique.values()]
+        with self._lock:
+            with self._open_locked("ab") as f:
+                f.write(recs.tobytes())     # 只追加；内存中的列在下次查询时增量读入
+            self._maybe_compact()
+        return len(recs)
+
+    def _maybe_compact(self):
+        """文件中最早的快照超出保留期 COMPACT_SLACK 时清理；每进程每 COMPACT_CHECK_SECONDS 秒最多检查一次"""
+        now = time.time()
+        if not self.retention_seconds or now - self._checked < COMPACT_CHECK_SECONDS:
+            return
+        self._checked = now
+        with open(self.path, "rb") as f:
+            head = f.read(RECORD.itemsize)
+        if len(head) < RECORD.itemsize:
+            return
+        oldest = int(np.frombuffer(head, dtype=RECORD)["ts"][0])
+        if oldest < now - self.retention_seconds * (1 + COMPACT_SLACK):
+            self._compact(self.retention_seconds)
+
+    def growth(self, videos, field="like", window_hours=24, now=None) -> np.ndarray:
+        """每个视频在最近 window_hours 小时内 field 的每小时增量。
+
+        用窗口内最早与最晚两次快照计算；窗口内只有一次快照但视频在窗口内发布时，
+        以发布时刻（各项为 0）为起点。无法计算的记为 NaN（与任何阈值比较都不成立）。
+        """
+        now = int(now if now is not None else time.time())
+        cutoff = now - int(window_hours * 3600)
+        out = np.full(len(videos), np.nan)
+        with self._lock:
+            self._load()
+            if not self._n or not len(videos):
+                return out
+            keys, order = self._index()
+            q = np.fromiter((self._ids.get(v.bvid, -1) for v in videos), dtype=np.int64, count=len(videos))
+            lo = np.searchsorted(keys, (q << _TS_BITS) + cutoff, "left")
+            hi = np.searchsorted(keys, (q << _TS_BITS) + now, "right") - 1
+            found = (q >= 0) & (hi >= lo)
+            first, last = order[np.minimum(lo, self._n - 1)], order[np.maximum(hi, 0)]
+            t0, t1 = self._cols["ts"][first], self._cols["ts"][last]
+            v0, v1 = self._cols[field][first], self._cols[field][last]
+
+        span = (t1 - t0) / 3600
+        two = found & (span > 0)
+        out[two] = (v1[two] - v0[two]) / span[two]
+
+        pub = np.fromiter((v.pubdate for v in videos), dtype=np.int64, count=len(videos))
+        age = (t1 - pub) / 3600
+        one = found & ~two & (pub >= cutoff) & (age > 0)
+        out[one] = v1[one] / age[one]
+        return out
+
+    def compact(self, max_age_seconds):
+        """只保留最近 max_age_seconds 内的快照（重写文件），返回删除条数"""
+        with self._lock:
+            return self._compact(max_age_seconds)
+
+    def _compact(self, max_age_seconds):
+        """持锁读出整个文件，过滤后写入唯一临时文件并原子替换；内存中的列在下次查询时重载"""
+        cutoff = time.time() - max_age_seconds
+        f = self._open_locked("rb")
+        try:
+            data = f.read()
+            recs = np.frombuffer(data[:len(data) // RECORD.itemsize * RECORD.itemsize], dtype=RECORD)
+            keep = recs["ts"] >= cutoff
+            if keep.all():
+                return 0
+            fd, tmp = tempfile.mkstemp(prefix=self.path.name + ".", suffix=".tmp", dir=self.path.parent)
+            try:
+                with os.fdopen(fd, "wb") as out:
+                    out.write(recs[keep].tobytes())
+                if fcntl is None:
+                    f.close()           # Windows 不能替换仍被打开的文件
+                os.replace(tmp, self.path)
+            except BaseException:
+                Path(tmp).unlink(missing_ok=True)
+                raise
+        finally:
+            f.close()
+        self._reset()
+        return int(len(recs) - keep.sum())
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_stats_store():
+    """按 config.json 的 "stats" 段返回共享的快照存储；未启用时返回 None"""
+    global _store
+    conf = tool.load_config().get("stats", {})
+    if not conf.get("enabled", True):
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                retention = conf.get("retention_days", DEFAULT_RETENTION_DAYS)
+                _store = StatsStore(
+                    tool.config_path(conf.get("path", DEFAULT_PATH)),
+                    retention_seconds=retention * 86400 if retention else None,
+                )
+    return _store
@@ -0,0 +1,310 @@
+"""本地封面缩略图服务，可替代 images.weserv.nl 代理。
+
+- 每个封面只下载一次，缩放到卡片尺寸后存入磁盘；
+- 磁盘缓存按 URL 哈希命名，总大小超过上限时按最近访问时间（mtime）淘汰；
+- 内置 HTTP 服务 /thumb?url=...，带长期缓存头，浏览器只需请求一次；
+- prefetch() 在后台线程池里并发预取，搜索结果一边到达一边预热；
+- 测试时可传入 ThumbCache(fetch=load_file) 直接使用本地图片。
+
+配置见 config.json 的 "thumbs" 段（默认关闭）。单独运行：
+
+    python -m modules.thumbs --port 8765
+
+缩放依赖 Pillow（Streamlit 自带）；未安装时按原图缓存。
+"""
+import argparse
+import hashlib
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, quote_plus, urlparse
+from urllib.request import url2pathname
+
+from modules import tool
+from modules.client import get_client
+
+try:
+    from PIL import Image
+except ImportError:     # 没有 Pillow 时不缩放
+    Image = None
+
+DEFAULTS = {
+    "enabled": False,
+    "host": "127.0.0.1",
+    "port": 8765,
+    "public_url": None,         # 对外可访问的服务地址（如反向代理后的 https 地址）
+    "dir": ".cache/thumbs",
+    "max_mb": 256,
+    "width": 320,               # 卡片宽度，高度按 16:9
+    "workers": 8,
+    # 只代理这些域名下的图片，防止服务被用来访问任意地址
+    "allowed_hosts": ["hdslb.com", "biliimg.com"],
+}
+WESERV = "https://images.weserv.nl/?url="
+CACHE_CONTROL = "public, max-age=604800, immutable"
+
+
+def normalize_cover(cover: str) -> str:
+    cover = cover or ""
+    if cover.startswith("//"):
+        cover = "https:" + cover
+    return cover.replace("http://", "https://")
+
+
+def load_url(url: str) -> bytes:
+    """通过共享 HTTP 客户端下载图片"""
+    resp = get_client().get(url, timeout=10)
+    resp.raise_for_status()
+    return resp.content
+
+
+def load_file(url: str) -> bytes:
+    """读取 file:// 或本地路径的图片，用于用本地图片测试（不要用于对外服务）"""
+    parsed = urlparse(url)
+    if parsed.scheme == "file":
+        return Path(url2pathname(parsed.path)).read_bytes()
+    return Path(url).read_bytes()
+
+
+def downscale(data: bytes, width: int) -> bytes:
+    """按 16:9 居中裁剪并缩放为 JPEG；无 Pillow 或无法解析时原样返回"""
+    if Image is None:
+        return data
+    try:
+        img = Image.open(io.BytesIO(data))
+        img = img.convert("RGB")
+        height = width * 9 // 16
+        w, h = img.size
+        if w * 9 > h * 16:          # 过宽，裁左右
+            nw = h * 16 // 9
+            img = img.crop(((w - nw) // 2, 0, (w - nw) // 2 + nw, h))
+        elif w * 9 < h * 16:        # 过高，裁上下
+            nh = w * 9 // 16
+            img = img.crop((0, (h - nh) // 2, w, (h - nh) // 2 + nh))
+        img = img.resize((width, height), Image.LANCZOS)
+        out = io.BytesIO()
+        img.save(out, "JPEG", quality=82, optimize=True)
+        return out.getvalue()
+    except Exception:
+        return data
+
+
+def content_type(data: bytes) -> str:
+    if data.startswith(b"\x89PNG"):
+        return "image/png"
+    if data.startswith(b"GIF8"):
+        return "image/gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return "image/jpeg"
+
+
+class ThumbCache:
+    def __init__(self, directory, max_bytes, width=DEFAULTS["width"], fetch=load_url):
+        self.dir = Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.width = width
+        self.fetch = fetch
+        self._lock = threading.Lock()
+        self._inflight = {}     # 同一 URL 的并发请求只下载一次
+        self._total = sum(p.stat().st_size for p in self.dir.glob("*.img"))
+
+    def _path(self, url):
+        return self.dir / (hashlib.sha1(url.encode("utf-8")).hexdigest() + ".img")
+
+    def get(self, url):
+        """返回已缓存的缩略图，未缓存返回 None（命中时刷新其 LRU 时间）"""
+        path = self._path(url)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+            return data
+        except FileNotFoundError:
+            return None
+
+    def put(self, url, data):
+        path = self._path(url)
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        with self._lock:
+            try:
+                old = path.stat().st_size   # 覆盖已有文件时扣除旧文件的大小
+            except FileNotFoundError:
+                old = 0
+            os.replace(tmp, path)       # 原子替换，其他进程不会读到半个文件
+            self._total += len(data) - old
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        files = []
+        for p in self.dir.glob("*.img"):
+            try:
+                st = p.stat()
+                files.append((st.st_mtime, st.st_size, p))
+            except FileNotFoundError:
+                pass
+        files.sort()
+        total = sum(f[1] for f in files)
+        for _, size, p in files:
+            if total <= self.max_bytes * 0.9:
+                break
+            p.unlink(missing_ok=True)
+            total -= size
+        self._total = total
+
+    def thumbnail(self, url):
+        """返回缩略图字节：先查缓存，否则下载、缩放并写入缓存。
+
+        同一 url 正在由其他线程下载时等待其结果；那次下载失败时返回 None。
+        """
+        data = self.get(url)
+        if data is not None:
+            return data
+        with self._lock:
+            event = self._inflight.get(url)
+            owner = event is None
+            if owner:
+                event = self._inflight[url] = threading.Event()
+        if not owner:
+            event.wait()
+            return self.get(url)
+        try:
+            data = downscale(self.fetch(url), self.width)
+            self.put(url, data)
+            return data
+        finally:
+            with self._lock:
+                self._inflight.pop(url, None)
+            event.set()
+
+
+class ThumbService:
+    def __init__(self, cache: ThumbCache, host, port, workers=DEFAULTS["workers"], public_url=None,
+                 allowed_hosts=tuple(DEFAULTS["allowed_hosts"])):
+        self.cache = cache
+        self.allowed_hosts = allowed_hosts
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                src = parse_qs(url.query).get("url", [""])[0]
+                if url.path != "/thumb" or not src:
+                    self.send_error(404)
+                    return
+                if not service.allowed(src):
+                    self.send_error(403)
+                    return
+                etag = '"' + hashlib.sha1(src.encode("utf-8")).hexdigest() + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Cache-Control", CACHE_CONTROL)
+                    self.end_headers()
+                    return
+                try:
+                    data = service.cache.thumbnail(src)
+                except Exception:
+                    data = None
+                if data is None:
+                    self.send_error(502)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type(data))
+                self.send_header("Content-Length", str(len(data)))
+                self.send_header("Cache-Control", CACHE_CONTROL)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        bound_host, bound_port = self.httpd.server_address[:2]
+        self.base_url = (public_url or f"http://{bound_host}:{bound_port}").rstrip("/")
+
+    def allowed(self, url: str) -> bool:
+        """allowed_hosts 为 None 时不限制（仅用于本地测试）"""
+        if self.allowed_hosts is None:
+            return True
+        parsed = urlparse(url)
+        host = parsed.hostname or ""
+        return parsed.scheme in ("http", "https") and any(
+            host == h or host.endswith("." + h) for h in self.allowed_hosts
+        )
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.pool.shutdown(wait=False)
+
+    def url_for(self, cover: str) -> str:
+        return f"{self.base_url}/thumb?url={quote_plus(normalize_cover(cover))}"
+
+    def prefetch(self, covers):
+        """后台并发预取一批封面（已缓存的跳过），立即返回"""
+        for cover in covers:
+            url = normalize_cover(cover)
+            if url and self.allowed(url) and not self.cache._path(url).exists():
+                self.pool.submit(self.cache.thumbnail, url)
+
+
+def load_settings() -> dict:
+    return {**DEFAULTS, **tool.load_config().get("thumbs", {})}
+
+
+def create_service(settings=None) -> ThumbService:
+    s = settings or load_settings()
+    cache = ThumbCache(tool.config_path(s["dir"]), int(s["max_mb"] * 1024 * 1024), s["width"])
+    return ThumbService(cache, s["host"], s["port"], s["workers"], s["public_url"],
+                        tuple(s["allowed_hosts"]))
+
+
+def weserv_url(cover: str) -> str:
+    cover = normalize_cover(cover)
+    return WESERV + quote_plus(cover[8:], safe=":/")
+
+
+def cover_url(cover: str, service: ThumbService | None = None, *, public=False) -> str:
+    """卡片 / 推送中使用的封面地址。
+
+    有本地服务时走本地缩略图；public=True（推送给外部设备）时只有配置了
+    public_url 才使用本地服务，否则退回 images.weserv.nl。
+    """
+    if service is not None:
+        return service.url_for(cover)
+    if public:
+        s = load_settings()
+        if s["enabled"] and s["public_url"]:
+            return f"{s['public_url'].rstrip('/')}/thumb?url={quote_plus(normalize_cover(cover))}"
+    return weserv_url(cover)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="本地封面缩略图服务")
+    ap.add_argument("--host")
+    ap.add_argument("--port", type=int)
+    args = ap.parse_args()
+    settings = load_settings()
+    if args.host:
+        settings["host"] = args.host
+    if args.port:
+        settings["port"] = args.port
+    service = create_service(settings)
+    print("thumb service:", service.base_url)
+    try:
+        service.httpd.serve_forever()
+    except KeyboardInterrupt:
+        service.httpd.server_close()
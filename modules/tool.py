@@ -1,22 +1,34 @@
 from datetime import datetime, date,timedelta
-from dateutil.relativedelta import relativedelta  # pip install python-dateutil
 import json
 import os
+import threading
 
 #时间戳
-def get_time_range(mode: str = "1d", custom_start: str = None, custom_end: str = None):
+def get_time_range(mode: str = "1d", custom_start: str = None, custom_end: str = None,
+                   *, since_ts: int = None, overlap: int = 0):
     """
     获取指定时间段的起止时间戳（单位：秒）
 
     参数:
-    - mode: 可选时间段 '1d', '3d', '7d', '1m', '1y', 'custom'
+    - mode: 可选时间段 '1d', '3d', '7d', '1m', '1y', 'custom', 'since'
     - custom_start / custom_end: 当 mode='custom' 时使用，格式 'YYYY-MM-DD'
+    - since_ts / overlap: 当 mode='since' 时使用，从水位线 since_ts 往前回退
+      overlap 秒开始，到今天 23:59:59 结束（用于增量抓取）
 
     返回:
     - dict: {"start_ts": int, "end_ts": int}
     """
     today = datetime.now().date()
 
+    if mode == "since":
+        if since_ts is None:
+            raise ValueError("since 模式必须提供 since_ts")
+        end_dt = datetime.combine(today, datetime.max.time()).replace(microsecond=0)
+        return {
+            "start_ts": max(0, int(since_ts) - overlap),
+            "end_ts": int(end_dt.timestamp())
+        }
+
     if mode == "custom":
         if not (custom_start and custom_end):
             raise ValueError("自定义模式必须提供 custom_start 和 custom_end")
@@ -35,10 +47,9 @@ def get_time_range(mode: str = "1d", custom_start: str = None, custom_end: str =
             start_date = today - timedelta(days=3)
         elif mode == "7d":
             start_date = today - timedelta(days=7)
-        elif mode == "1m":
-            start_date = today - relativedelta(months=1)
-        elif mode == "1y":
-            start_date = today - relativedelta(years=1)
+        elif mode in ("1m", "1y"):
+            from dateutil.relativedelta import relativedelta  # pip install python-dateutil；仅在此处用到，延迟导入
+            start_date = today - (relativedelta(months=1) if mode == "1m" else relativedelta(years=1))
         else:
             raise ValueError("未知的模式：" + mode)
         end_date = today
@@ -53,17 +64,39 @@ def get_time_range(mode: str = "1d", custom_start: str = None, custom_end: str =
     }
 
 #读取config.json
-def load_config_from_parent(filename="config.json"):
+_config_lock = threading.Lock()
+_config_cache = {}  # path -> (mtime_ns, config)
+
+
+def config_path(filename="config.json"):
+    """返回项目根目录（modules 的父目录）下配置文件的绝对路径"""
     # 获取当前脚本文件所在路径
     current_dir = os.path.dirname(os.path.abspath(__file__))
     # 找到父目录
     parent_dir = os.path.dirname(current_dir)
     # 构造完整路径
-    config_path = os.path.join(parent_dir, filename)
+    return os.path.join(parent_dir, filename)
+
 
-    with open(config_path, "r", encoding="utf-8") as f:
-        config = json.load(f)
+def load_config(filename="config.json") -> dict:
+    """读取并缓存 config.json，仅在文件 mtime 变化时重新解析。
 
+    返回的 dict 在多处共享，调用方不要原地修改。
+    """
+    path = config_path(filename)
+    mtime = os.stat(path).st_mtime_ns
+    with _config_lock:
+        cached = _config_cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        _config_cache[path] = (mtime, config)
+        return config
+
+
+def load_config_from_parent(filename="config.json"):
+    config = load_config(filename)
     return config["headers"], config["cookies"]
 
 
@@ -1,87 +1,184 @@
-import json
-import random
 from pathlib import Path
-from urllib.parse import quote_plus
 
 import requests
-from search_core import search_with_keywords    # ← 你的搜索核心
+
+from modules.client import get_client
+from modules.history import HistoryStore
+from modules.metrics import metrics
+from modules.neardup import NearDupIndex
+from modules.outbox import Outbox
+from modules.ranking import Ranker
+from modules.thumbs import cover_url
+from search_core import stream_search           # ← 你的搜索核心
 
 # ── 配置区域 ─────────────────────────────────────────────
 PUSHPLUS_TOKEN   = "Your_PushPlus_Token"
+PUSHPLUS_URL     = "http://www.pushplus.plus/send"
 
 KEYWORDS         = ["mygo", "赛马娘", "ave mujica", "孤独摇滚",
                     "bangdream", "娱乐", "知识"]
 BANNED_KEYWORDS  = ["曼波"]
 MIN_PLAY         = 3_000
 MIN_LIKE_RATIO   = 0.06          # 6 %
-PAGE_SIZE        = 40            # 每关键词抓 40
+MIN_LIKE_GROWTH  = 0             # 最近 GROWTH_WINDOW_HOURS 小时内每小时新增点赞下限，0 为不限
+GROWTH_WINDOW_HOURS = 24         # 增速按历次抓取的数据快照计算（config.json 的 "stats" 段）
+PAGE_SIZE        = 40            # 每关键词每页抓 40
+MAX_PAGES        = 5             # 每关键词最多翻 5 页（凑够 MAX_PUSH 即停）
 DATA_MODE        = "3d"          # 最近 3 天
 MAX_PUSH         = 10            # 每日最多推 10 条
+RANK_POOL        = 50            # 候选凑够该条数后，本轮翻完即停止翻页，已抓到的全部参与评分
+RANK_WEIGHTS     = None          # 评分权重，None 为 ranking.DEFAULT_WEIGHTS
+PER_KEYWORD_CAP  = 3             # 同一关键词最多推几条，None 为不限
+PER_AUTHOR_CAP   = 2             # 同一 UP 主最多推几条，None 为不限
 LIMIT_CHARS      = 20_000        # PushPlus 最大字符
 
-HISTORY_FILE     = Path("sent_history.json")    # 已推送记录
+HISTORY_DB       = Path("sent_history.db")      # 已推送记录
+HISTORY_FILE     = Path("sent_history.json")    # 旧版记录，首次运行时自动导入
+HISTORY_TTL_DAYS = None          # 只保留最近 N 天的记录，None 为永久保留
+NEAR_DUP_DISTANCE = None         # 标题 SimHash 汉明距离 ≤ 该值视为搬运/切片重复（如 3），None 关闭
+
+OUTBOX_DB        = Path("outbox.db")            # 待投递消息，失败后下次运行继续重试
+OUTBOX_DEAD_DAYS = 30            # 重试用尽（dead）的消息保留 N 天，None 为永久保留
+PUSH_WORKERS     = 4             # 并发投递线程数
+PUSH_RATE        = 1.0           # 每个推送端点每秒最多投递条数
+
+# 增量模式：每个关键词只检索上次已处理的最新发布时间（水位线）之后的视频，
+# 回退 WATERMARK_OVERLAP 秒防止边界遗漏；还没有水位线的关键词按 DATA_MODE 抓取。
+# 增量模式下按发布时间从新到旧翻页，只有一直翻到上次水位线时才推进水位线；
+# 一次运行翻不完（超过 MAX_PAGES 或凑够 RANK_POOL）时保留原水位线，下次重新检索。
+# 注意：当时已抓到但未达阈值的视频，之后涨上来也不会再被检索到。
+INCREMENTAL      = False
+WATERMARK_OVERLAP = 3600
+
+# 每次运行（scheduler 为每轮）结束后导出指标，None 表示不导出
+METRICS_JSON     = None          # 例如 Path("run_trace.json")
+METRICS_PROM     = None          # 例如 Path("/var/lib/node_exporter/bilidream.prom")
 
 # ── PushPlus 发送 ─────────────────────────────────────
-def push_markdown(title: str, md: str) -> bool:
-    r = requests.post(
-        "http://www.pushplus.plus/send",
-        json={
-            "token": PUSHPLUS_TOKEN,
-            "title": title,
-            "content": md,
-            "template": "markdown",
-        },
-        timeout=10,
-    )
+def send_pushplus(endpoint: str, token: str, title: str, md: str) -> bool:
+    """投递一条 PushPlus 消息；网络错误或接口返回非 200 的 code 都视为失败"""
+    try:
+        with metrics.timer("push_seconds"):
+            r = get_client().post(
+                endpoint,
+                json={
+                    "token": token,
+                    "title": title,
+                    "content": md,
+                    "template": "markdown",
+                },
+                timeout=10,
+            )
+    except requests.RequestException as e:
+        print("PushPlus:", e)
+        metrics.incr("push_total", status="network")
+        return False
     print("PushPlus:", r.status_code, r.text[:120])
-    return r.status_code == 200
+    ok = r.status_code == 200
+    if ok:
+        try:
+            ok = r.json().get("code", 200) == 200
+        except ValueError:
+            pass
+    metrics.incr("push_total", status="ok" if ok else f"http_{r.status_code}")
+    return ok
+
+def push_markdown(title: str, md: str, token: str | None = None) -> bool:
+    return send_pushplus(PUSHPLUS_URL, token or PUSHPLUS_TOKEN, title, md)
+
+def flush_outbox(outbox: Outbox) -> dict:
+    """投递发件箱中所有到期的消息（包括以前运行失败留下的）"""
+    return outbox.deliver(send_pushplus, workers=PUSH_WORKERS, rate_per_endpoint=PUSH_RATE)
 
 # ── 历史记录 ───────────────────────────────────────────
-def load_history() -> set[str]:
-    try:
-        return set(json.loads(HISTORY_FILE.read_text("utf-8")))
-    except Exception:
-        return set()
-
-def save_history(bvids: set[str]):
-    HISTORY_FILE.write_text(json.dumps(sorted(bvids), indent=2), "utf-8")
+def open_history() -> HistoryStore:
+    history = HistoryStore(HISTORY_DB, legacy_json=HISTORY_FILE)
+    if HISTORY_TTL_DAYS:
+        history.compact(HISTORY_TTL_DAYS * 86400)
+    return history
+
+def open_outbox() -> Outbox:
+    outbox = open_outbox()
+    if OUTBOX_DEAD_DAYS:
+        outbox.compact(OUTBOX_DEAD_DAYS * 86400)
+    return outbox
 
 # ── 抓取 + 本次去重 ─────────────────────────────────────
-def fetch_new_videos():
-    # 1. 抓取多关键词
-    videos = search_with_keywords(
+def open_neardup() -> NearDupIndex | None:
+    if NEAR_DUP_DISTANCE is None:
+        return None
+    return NearDupIndex(HISTORY_DB, max_distance=NEAR_DUP_DISTANCE)
+
+def fetch_new_videos(history: HistoryStore | None = None, latest: dict | None = None,
+                     exclude: set | None = None, neardup: NearDupIndex | None = None):
+    """抓取本次待推送的视频；传入 latest 时把各关键词的新水位线写入其中
+
+    exclude 为额外需要跳过的 bvid（如发件箱中尚未投递成功的）；
+    传入 neardup 时同时跳过与已推送视频标题近似重复的稿件。
+    """
+    if history is None:
+        history = open_history()
+    exclude = exclude or set()
+    seen_pages = {}     # 关键词 -> (最新发布时间, 最后一页是否满页)
+    candidates = []
+
+    def track(keyword, page):
+        newest = seen_pages.get(keyword, (0,))[0]
+        if page:
+            newest = max(newest, max(v.pubdate for v in page))
+        seen_pages[keyword] = (newest, len(page) >= PAGE_SIZE)
+
+    # 1. 多关键词逐页流式抓取（已按 bvid 全局去重）
+    videos = stream_search(
         KEYWORDS,
         page_size=PAGE_SIZE,
         data_mode=DATA_MODE,
+        max_pages=MAX_PAGES,
+        since=history.watermarks() if INCREMENTAL else None,
+        overlap=WATERMARK_OVERLAP,
+        on_page=track,
+        order="pubdate" if INCREMENTAL else None,
         min_play=MIN_PLAY,
         min_like_ratio=MIN_LIKE_RATIO,
         banned_keywords=BANNED_KEYWORDS,
+        min_like_growth=MIN_LIKE_GROWTH,
+        growth_window_hours=GROWTH_WINDOW_HOURS,
+        enough=lambda: len(candidates) >= RANK_POOL,
     )
-    # 2. 全局去重（同一视频命中多个关键词时）
-    unique = {}
-    for v in videos:
-        unique.setdefault(v.bvid, v)
-    videos = list(unique.values())
-
-    # 3. 去掉历史已推送
-    sent = load_history()
-    fresh = [v for v in videos if v.bvid not in sent]
 
-    # 4. 随机顺序 + 截至 MAX_PUSH
-    random.shuffle(fresh)
-    return fresh[:MAX_PUSH]
+    # 2. 去掉历史已推送（及其近似重复）；凑够 RANK_POOL 条候选后翻完当前一轮即停止，
+    #    候选集合恰好是已抓取的若干整轮，评分结果不受抓取快慢影响
+    fresh = (v for v in videos if v.bvid not in exclude and v.bvid not in history)
+    if neardup is not None:
+        fresh = neardup.iter_unique(fresh)
+    candidates.extend(fresh)
+
+    # 水位线：从新到旧翻页时，只有某关键词一直翻到了检索范围的下界（最后一页不满）
+    # 才推进到它的最新发布时间（抓到的页都已整页消费）；否则保留原水位线，
+    # 下次仍从原水位线检索，这次没翻到的更早视频不会被跳过。
+    if latest is not None:
+        for kw, (newest, last_full) in seen_pages.items():
+            if newest and not last_full:
+                latest[kw] = newest
+
+    # 3. 按评分选出前 MAX_PUSH 条（同一关键词 / UP 主有数量上限）
+    ranker = Ranker(MAX_PUSH, weights=RANK_WEIGHTS,
+                    per_keyword=PER_KEYWORD_CAP, per_author=PER_AUTHOR_CAP)
+    return ranker(candidates)
 
 # ── Markdown 构造（保证 ≤ 20 000 字） ──────────────────
 def build_markdown(videos):
+    with metrics.timer("build_markdown_seconds"):
+        md = _build_markdown(videos)
+    metrics.observe("markdown_chars", len(md))
+    return md
+
+def _build_markdown(videos):
     lines = ["## 🎬 最近 3 天精选视频\n"]
     total_len = len(lines[0]) + 2
 
     for idx, v in enumerate(videos, 1):
-        cover = v.cover
-        if cover.startswith("//"):
-            cover = "https:" + cover
-        cover = cover.replace("http://", "https://")
-        proxy = "https://images.weserv.nl/?url=" + quote_plus(cover[8:], safe=":/")
+        proxy = cover_url(v.cover, public=True)
         link  = f"https://www.bilibili.com/video/{v.bvid}"
 
         block = [
@@ -101,20 +198,48 @@ def build_markdown(videos):
     return "".join(lines)
 
 # ── 主流程 ─────────────────────────────────────────────
-def main():
-    new_videos = fetch_new_videos()
+def _run():
+    history = open_history()
+    neardup = open_neardup()
+    outbox = open_outbox()
+    history_path = HISTORY_DB.resolve()
+
+    # 先补投以前失败的消息，不必为此重新抓取
+    retried = flush_outbox(outbox)
+    if retried["sent"] or retried["failed"]:
+        print(f"补投历史消息：成功 {retried['sent']} 条，失败 {retried['failed']} 条")
+
+    latest = {}
+    new_videos = fetch_new_videos(history, latest, exclude=outbox.pending_bvids(history_path),
+                                  neardup=neardup)
     if not new_videos:
         print("无新视频可推送")
+        if INCREMENTAL:
+            history.advance_watermarks(latest)
         return
 
     md = build_markdown(new_videos)
-    if push_markdown("B 站视频推送", md):
-        hist = load_history()
-        hist.update(v.bvid for v in new_videos)
-        save_history(hist)
-        print(f"已推送 {len(new_videos)} 条，历史库大小：{len(hist)}")
+    outbox.enqueue(PUSHPLUS_URL, PUSHPLUS_TOKEN, "B 站视频推送", md,
+                   [v.bvid for v in new_videos], history=history_path)
+    if neardup is not None:   # 消息已落盘并会重试到成功，此时即收录指纹
+        neardup.add_many(new_videos)
+    if INCREMENTAL:     # 内容已落盘，即使投递失败也会在下次运行时重试
+        history.advance_watermarks(latest)
+
+    if flush_outbox(outbox)["sent"]:
+        print(f"已推送 {len(new_videos)} 条，历史库大小：{len(history)}")
     else:
-        print("推送失败")
+        print("推送失败，已保存到发件箱，下次运行时重试")
+
+def main():
+    metrics.reset()
+    try:
+        _run()
+    finally:
+        if METRICS_JSON:
+            metrics.export_json(METRICS_JSON)
+        if METRICS_PROM:
+            metrics.export_prometheus(METRICS_PROM)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,177 @@
+"""常驻调度器：一个进程服务多个订阅者（profile），共享抓取结果。
+
+每个 profile 有自己的 PushPlus token、关键词、筛选条件、推送周期和历史库。
+每一轮先把所有到期 profile 的查询按 (时间范围, 每页条数, 页数) 合并，同一关键词
+在一轮里只抓取一次；再对共享结果池分别执行各 profile 的筛选和去重，生成的消息
+写入共享发件箱，由有界线程池并发投递，失败的消息在之后的轮次中重试。
+
+    python scheduler.py --profiles profiles.json          # 常驻运行
+    python scheduler.py --profiles profiles.json --once   # 所有 profile 各跑一次后退出
+
+profiles.json 的格式见 profiles.example.json；文件修改后下一轮自动重新加载。
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+import pushplus
+from modules.history import HistoryStore
+from modules.metrics import metrics
+from modules.neardup import NearDupIndex
+from modules.outbox import Outbox
+from modules.ranking import Ranker
+from search_core import fetch_keywords, merge_filtered
+
+DEFAULT_PROFILE = {
+    "token": "",
+    "keywords": [],
+    "banned_keywords": [],
+    "min_play": pushplus.MIN_PLAY,
+    "min_like_ratio": pushplus.MIN_LIKE_RATIO,
+    "page_size": pushplus.PAGE_SIZE,
+    "max_pages": 1,
+    "data_mode": pushplus.DATA_MODE,
+    "max_push": pushplus.MAX_PUSH,
+    "rank_weights": pushplus.RANK_WEIGHTS,
+    "per_keyword_cap": pushplus.PER_KEYWORD_CAP,
+    "per_author_cap": pushplus.PER_AUTHOR_CAP,
+    "near_dup_distance": pushplus.NEAR_DUP_DISTANCE,
+    "interval_minutes": 24 * 60,
+    "history": None,                # 默认 history/<name>.db
+    "title": "B 站视频推送",
+}
+IDLE_SLEEP = 60                     # 没有到期 profile 时最长等待秒数
+OUTBOX_DB = Path("outbox.db")       # 所有 profile 共用的发件箱
+
+
+def load_profiles(path) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    profiles = []
+    for i, p in enumerate(raw):
+        profile = {**DEFAULT_PROFILE, **p}
+        profile.setdefault("name", f"profile{i}")
+        profile["history"] = profile["history"] or f"history/{profile['name']}.db"
+        profiles.append(profile)
+    return profiles
+
+
+def query_key(profile):
+    return profile["data_mode"], profile["page_size"], profile["max_pages"]
+
+
+def fetch_shared(profiles) -> dict:
+    """合并所有 profile 的查询，每个 (关键词, 查询参数) 只抓一次
+
+    Returns:
+        {(data_mode, page_size, max_pages): {keyword: [BiliVideo]}}
+    """
+    groups = {}
+    for p in profiles:
+        groups.setdefault(query_key(p), {}).update(dict.fromkeys(p["keywords"]))
+
+    pool = {}
+    for (data_mode, page_size, max_pages), keywords in groups.items():
+        keywords = list(keywords)
+        results = fetch_keywords(keywords, page_size, data_mode, max_pages=max_pages)
+        pool[(data_mode, page_size, max_pages)] = dict(zip(keywords, results))
+        print(f"[shared] {data_mode}/{page_size}x{max_pages}: {len(keywords)} 个关键词，"
+              f"{sum(map(len, results))} 条结果")
+    return pool
+
+
+def open_history(profile) -> HistoryStore:
+    path = Path(profile["history"])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return HistoryStore(path)
+
+
+def run_profile(profile, pool, outbox: Outbox):
+    """对共享结果池执行单个 profile 的筛选 → 去重，把推送内容写入发件箱"""
+    name = profile["name"]
+    by_keyword = pool[query_key(profile)]
+    videos = merge_filtered(
+        [by_keyword[kw] for kw in profile["keywords"]],
+        min_play=profile["min_play"],
+        min_like_ratio=profile["min_like_ratio"],
+        banned_keywords=profile["banned_keywords"],
+        shuffle=False,
+    )
+    history_path = Path(profile["history"]).resolve()
+    pending = outbox.pending_bvids(history_path)
+    history = open_history(profile)
+    neardup = None
+    if profile["near_dup_distance"] is not None:
+        neardup = NearDupIndex(history_path, max_distance=profile["near_dup_distance"])
+    try:
+        fresh = [v for v in videos if v.bvid not in pending and v.bvid not in history]
+        if neardup is not None:
+            fresh = list(neardup.iter_unique(fresh))
+        ranker = Ranker(profile["max_push"], weights=profile["rank_weights"],
+                        per_keyword=profile["per_keyword_cap"], per_author=profile["per_author_cap"])
+        fresh = ranker(fresh)
+        if not fresh:
+            print(f"[{name}] 无新视频可推送")
+            return
+        md = pushplus.build_markdown(fresh)
+        outbox.enqueue(pushplus.PUSHPLUS_URL, profile["token"], profile["title"], md,
+                       [v.bvid for v in fresh], history=history_path)
+        if neardup is not None:
+            neardup.add_many(fresh)
+        print(f"[{name}] 待推送 {len(fresh)} 条")
+    finally:
+        history.close()
+        if neardup is not None:
+            neardup.close()
+
+
+def run_cycle(profiles, outbox: Outbox):
+    pool = fetch_shared(profiles)
+    for p in profiles:
+        try:
+            run_profile(p, pool, outbox)
+        except Exception as e:      # 单个订阅者出错不影响其他订阅者
+            print(f"[{p['name']}] 运行出错:", e)
+    result = pushplus.flush_outbox(outbox)
+    if pushplus.OUTBOX_DEAD_DAYS:
+        outbox.compact(pushplus.OUTBOX_DEAD_DAYS * 86400)
+    print(f"投递完成：成功 {result['sent']} 条，失败 {result['failed']} 条，"
+          f"发件箱状态 {outbox.counts()}")
+
+
+def serve(path, once=False):
+    outbox = Outbox(OUTBOX_DB)
+    mtime = None
+    profiles = []
+    next_run = {}
+    while True:
+        current = Path(path).stat().st_mtime_ns
+        if current != mtime:
+            profiles, mtime = load_profiles(path), current
+            print(f"已加载 {len(profiles)} 个 profile")
+
+        now = time.time()
+        due = [p for p in profiles if next_run.get(p["name"], 0) <= now]
+        if due:
+            run_cycle(due, outbox)
+            for p in due:
+                next_run[p["name"]] = now + p["interval_minutes"] * 60
+            # 每轮导出一次指标后清零（路径沿用 pushplus.METRICS_JSON / METRICS_PROM）
+            metrics.rotate(json_path=pushplus.METRICS_JSON, prom_path=pushplus.METRICS_PROM)
+        else:
+            pushplus.flush_outbox(outbox)   # 空闲时补投到期的重试消息
+        if once:
+            return
+
+        upcoming = [next_run.get(p["name"], 0) for p in profiles]
+        wait = min(upcoming, default=now + IDLE_SLEEP) - time.time()
+        time.sleep(min(IDLE_SLEEP, max(1.0, wait)))
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="BiliDream 多订阅者调度器")
+    ap.add_argument("--profiles", default="profiles.json")
+    ap.add_argument("--once", action="store_true", help="所有 profile 各运行一次后退出")
+    args = ap.parse_args()
+    serve(args.profiles, once=args.once)
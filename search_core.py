@@ -1,8 +1,104 @@
-from typing import List
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import zip_longest
+from typing import Callable, Dict, Iterator, List, Tuple
 import json
 import random
+import time
 
-from modules.bilibili_search import search_bilibili_videos, BiliVideo
+from modules import pipeline
+from modules.bilibili_search import search_bilibili_videos, iter_bilibili_pages, BiliVideo
+from modules.bvid import BvidSet
+from modules.matcher import compile_terms
+from modules.metrics import metrics
+from modules.sharding import iter_shard_pages
+
+# 同时在途的关键词请求上限；设为 1 即退化为逐个串行请求
+MAX_IN_FLIGHT = 4
+
+
+def fetch_keywords(
+        keywords: List[str],
+        page_size: int,
+        data_mode: str,
+        *,
+        custom_start=None,
+        custom_end=None,
+        max_in_flight: int | None = None,
+        max_pages: int = 1,
+) -> List[List[BiliVideo]]:
+    """并发抓取多个关键词，返回与 keywords 一一对应的结果列表。
+
+    Args:
+        keywords:      关键词列表。
+        page_size:     每个关键词请求的条目数。
+        data_mode:     时间范围模式，传递给 search_bilibili_videos。
+        max_in_flight: 最大并发请求数，默认使用模块级 MAX_IN_FLIGHT。
+        max_pages:     每个关键词抓取的页数，多页结果按页拼接。
+
+    Returns:
+        List[List[BiliVideo]]，顺序与 keywords 一致（与完成先后无关）。
+    """
+    workers = max(1, min(max_in_flight or MAX_IN_FLIGHT, len(keywords) or 1))
+
+    def _one(kw):
+        if max_pages > 1:
+            pages = iter_bilibili_pages(
+                kw,
+                page_size,
+                data_mode,
+                custom_start=custom_start,
+                custom_end=custom_end,
+                max_pages=max_pages
+            )
+            return [v for page in pages for v in page]
+        return search_bilibili_videos(
+            kw,
+            page_size,
+            data_mode,
+            custom_start=custom_start,
+            custom_end=custom_end
+        )
+
+    if workers == 1:
+        return [_one(kw) for kw in keywords]
+
+    # executor.map 按输入顺序返回结果，保证合并顺序确定
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_one, keywords))
+
+
+def iter_keywords(
+        keywords: List[str],
+        page_size: int,
+        data_mode: str,
+        *,
+        custom_start=None,
+        custom_end=None,
+        max_in_flight: int | None = None,
+        none_on_error: bool = False,
+) -> Iterator[Tuple[str, List[BiliVideo]]]:
+    """并发抓取多个关键词，按完成先后逐个 yield (关键词, 结果)。
+
+    适合需要边抓边展示的场景；需要确定顺序时请按 keywords 重新排列。
+    none_on_error 为真时，请求失败的关键词结果为 None。
+    """
+    workers = max(1, min(max_in_flight or MAX_IN_FLIGHT, len(keywords) or 1))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(
+                search_bilibili_videos,
+                kw,
+                page_size,
+                data_mode,
+                custom_start=custom_start,
+                custom_end=custom_end,
+                none_on_error=none_on_error,
+            ): kw
+            for kw in keywords
+        }
+        for fut in as_completed(futures):
+            yield futures[fut], fut.result()
 
 
 def filter_videos(
@@ -11,46 +107,81 @@ def filter_videos(
     min_play: int = 1000,
     min_like_ratio: float = 0.04,
     banned_keywords: List[str] | None = None,
+    min_favorites: int = 0,
+    allow_keywords: List[str] | None = None,
+    required_keywords: List[str] | None = None,
+    min_like_growth: float = 0,
+    growth_window_hours: float = 24,
+    stats_store=None,
+    shuffle: bool = True,
+    ranker: Callable[[List[BiliVideo]], List[BiliVideo]] | None = None,
 ) -> List[BiliVideo]:
-    """根据播放量 / 点赞比 / 屏蔽关键词筛选 B 站视频列表。
+    """根据播放量 / 点赞比 / 收藏数 / 点赞增速 / 屏蔽关键词筛选 B 站视频列表。
+
+    数值阈值在 VideoBatch 上以向量化掩码一次算完；文本匹配只对通过
+    数值阈值的视频进行，各词表编译为 Aho-Corasick 自动机（见 modules.matcher），
+    每条视频的 "标题 标签" 只扫描一遍。打乱顺序在最后做一次。
 
     Args:
         videos: search_bilibili_videos 返回的 BiliVideo 列表。
         min_play:   播放量阈值，低于该值的视频会被过滤掉。
         min_like_ratio: 赞 / 播放 的最小比例，低于该值的视频会被过滤掉。
         banned_keywords: 标题或标签中若出现任一关键词，则过滤掉该视频（大小写不敏感）。
+        min_favorites: 收藏数阈值，低于该值的视频会被过滤掉。
+        allow_keywords: 白名单，命中其中任一词的视频不受 banned_keywords 影响。
+        required_keywords: 必含词，标题或标签中至少出现其中一个才保留。
+        min_like_growth: 最近 growth_window_hours 小时内每小时新增点赞数的下限，
+                由历次抓取的数据快照计算（见 modules.stats_store）；无法计算的视频被过滤。
+        stats_store: 快照库，默认使用 config.json 中 "stats" 段配置的共享实例。
+        shuffle: 是否打乱结果顺序；为 False 时保持输入顺序。
+        ranker: 排序阶段（如 modules.ranking.Ranker），给出时代替 shuffle，
+                按评分返回前 K 条。
 
     Returns:
         过滤后的 BiliVideo 列表。
     """
-    if banned_keywords is None:
-        banned_keywords = []
+    if not videos:
+        return []
+    from modules.columnar import VideoBatch   # 延迟导入 numpy，命令行启动时不付出这部分开销
 
-    banned_lower = [kw.lower() for kw in banned_keywords]
-    filtered: List[BiliVideo] = []
+    t0 = time.perf_counter()
+    batch = VideoBatch(videos)
+    filtered = batch.take(batch.mask(
+        min_play=min_play,
+        min_like_ratio=min_like_ratio,
+        min_favorites=min_favorites,
+    ))
+    if min_like_growth > 0 and filtered:
+        from modules.stats_store import get_stats_store
 
-    for v in videos:
-        # --- 数值字段容错处理（B 站接口有时会返回带逗号的字符串） ---
-        try:
-            play = int(str(v.play).replace(",", ""))
-            like = int(str(v.like).replace(",", ""))
-        except ValueError:
-            play, like = 0, 0
-
-        like_ratio = like / play if play else 0  # 避免除零
-
-        # --- 过滤规则 ---
-        if play < min_play:
-            continue
-        if like_ratio < min_like_ratio:
-            continue
-        title_tag_combined = f"{v.title} {v.tag}".lower()
-        if any(bk in title_tag_combined for bk in banned_lower):
-            continue
-
-        filtered.append(v)
+        store = stats_store or get_stats_store()
+        if store is None:
+            raise ValueError("min_like_growth 需要数据快照库：请在 config.json 中启用 stats")
+        growth = store.growth(filtered, "like", growth_window_hours)
+        filtered = [v for v, ok in zip(filtered, growth >= min_like_growth) if ok]
+
+    banned = compile_terms(banned_keywords)
+    allow = compile_terms(allow_keywords)
+    required = compile_terms(required_keywords)
+    if required:
+        filtered = [v for v in filtered if required.matches(v.search_text)]
+    if banned:
+        filtered = [
+            v for v in filtered
+            if not banned.matches(v.search_text)
+            or (allow and allow.matches(v.search_text))
+        ]
+
+    if ranker is not None:
+        filtered = ranker(filtered)
+    elif shuffle:
         random.shuffle(filtered)
 
+    metrics.observe("filter_seconds", time.perf_counter() - t0)
+    kept = Counter(v.keyword for v in filtered)
+    for kw, total in Counter(v.keyword for v in videos).items():
+        metrics.incr("filter_input_total", total, keyword=kw)
+        metrics.incr("filter_dropped_total", total - kept[kw], keyword=kw)
     return filtered
 
 
@@ -65,6 +196,8 @@ def batch_search(
 ) -> List[BiliVideo]:
     """批量搜索多个关键词并按需过滤。
 
+    经 pipeline_search 逐页边抓边筛边去重，内存只随最终结果增长。
+
     Args:
         keywords:    关键词列表。
         page_size:   每个关键词请求的条目数。
@@ -72,23 +205,25 @@ def batch_search(
         **filter_kwargs: 传递给 filter_videos 的可选参数。
 
     Returns:
-        最终满足过滤规则的 BiliVideo 列表。
+        最终满足过滤规则的 BiliVideo 列表（按 bvid 去重）。
     """
-    all_videos: List[BiliVideo] = []
-    for kw in keywords:
-        vids = search_bilibili_videos(
-            kw,
-            page_size,
-            data_mode,
-            custom_start=custom_start,  # ← 继续下传
-            custom_end=custom_end
-        )
-        all_videos.extend(vids)
-
-    if filter_kwargs:
-        all_videos = filter_videos(all_videos, **filter_kwargs)
-
-    return all_videos
+    filtering = bool(filter_kwargs)
+    shuffle = filter_kwargs.pop("shuffle", True)
+    ranker = filter_kwargs.pop("ranker", None)
+    videos = list(pipeline_search(
+        keywords,
+        page_size,
+        data_mode,
+        custom_start=custom_start,      # ← 继续下传
+        custom_end=custom_end,
+        filtering=filtering,
+        **filter_kwargs,
+    ))
+    if ranker is not None:
+        videos = ranker(videos)
+    elif filtering and shuffle:
+        random.shuffle(videos)
+    return videos
 
 
 def videos_to_json(videos: List[BiliVideo], path: str | None = None):
@@ -98,44 +233,230 @@ def videos_to_json(videos: List[BiliVideo], path: str | None = None):
         with open(path, "w", encoding="utf-8") as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
     return data
-def search_with_keywords(
-    keywords: List[str],
-    page_size: int,
-    data_mode: str,
+def merge_filtered(
+    results: List[List[BiliVideo]],
     *,
     min_play: int = 0,
     min_like_ratio: float = 0,
     banned_keywords: List[str] = [],
-    custom_start: str | None = None,
-    custom_end: str | None = None,
     shuffle: bool = True,
+    ranker: Callable[[List[BiliVideo]], List[BiliVideo]] | None = None,
 ) -> List[BiliVideo]:
-    """多关键词搜索并统一筛选 + 日期支持 + 打乱顺序"""
+    """对每个关键词的原始结果分别筛选，再按 bvid 去重合并（纯本地计算，不联网）。
+
+    Args:
+        results: fetch_keywords 返回的按关键词分组的原始结果。
+        shuffle: 是否打乱最终顺序。
+        ranker:  排序阶段，给出时代替 shuffle，对合并结果按评分取前 K 条。
+    """
     all_videos = []
-    for kw in keywords:
-        vids = search_bilibili_videos(
-            keyword=kw,
-            page_size=page_size,
-            data_mode=data_mode,
-            custom_start=custom_start,
-            custom_end=custom_end,
-        )
+    for vids in results:
         filtered = filter_videos(
             vids,
             min_play=min_play,
             min_like_ratio=min_like_ratio,
             banned_keywords=banned_keywords,
+            shuffle=False,
         )
         all_videos.extend(filtered)
 
-    all_videos = list({v.bvid: v for v in all_videos}.values())
-    if shuffle:
-        import random
+    seen = BvidSet(len(all_videos))
+    all_videos = [v for v in all_videos if seen.add(v.bvid)]
+    if ranker is not None:
+        all_videos = ranker(all_videos)
+    elif shuffle:
         random.shuffle(all_videos)
 
     return all_videos
 
 
+def search_with_keywords(
+    keywords: List[str],
+    page_size: int,
+    data_mode: str,
+    *,
+    min_play: int = 0,
+    min_like_ratio: float = 0,
+    banned_keywords: List[str] = [],
+    custom_start: str | None = None,
+    custom_end: str | None = None,
+    shuffle: bool = True,
+    ranker: Callable[[List[BiliVideo]], List[BiliVideo]] | None = None,
+) -> List[BiliVideo]:
+    """多关键词搜索并统一筛选 + 日期支持 + 打乱顺序（或按 ranker 评分排序）
+
+    与 merge_filtered 语义相同，但经 pipeline_search 流式处理，不保留原始结果。
+    """
+    videos = list(pipeline_search(
+        keywords,
+        page_size,
+        data_mode,
+        custom_start=custom_start,
+        custom_end=custom_end,
+        min_play=min_play,
+        min_like_ratio=min_like_ratio,
+        banned_keywords=banned_keywords,
+    ))
+    if ranker is not None:
+        videos = ranker(videos)
+    elif shuffle:
+        random.shuffle(videos)
+    return videos
+
+
+def pipeline_search(
+    keywords: List[str],
+    page_size: int,
+    data_mode: str,
+    *,
+    custom_start: str | None = None,
+    custom_end: str | None = None,
+    max_pages: int | None = 1,
+    max_in_flight: int | None = None,
+    bloom_capacity: int | None = None,
+    filtering: bool = True,
+    **filter_kwargs,
+) -> Iterator[BiliVideo]:
+    """内存有界的流式检索（见 modules.pipeline）：抓取 → 解析 → 过滤 → 去重。
+
+    每页到达后立即用 filter_videos 过滤（filtering=False 时不过滤），
+    再以紧凑的 bvid 集合去重，按 keywords 顺序产出（与 merge_filtered(fetch_keywords(...))
+    一致，与抓取快慢无关）；排序 / 打乱由调用方对最终结果进行。
+    bloom_capacity 给出时在去重集合前加一层布隆过滤器。
+    """
+    accept = None
+    if filtering:
+        def accept(page):
+            return filter_videos(page, shuffle=False, **filter_kwargs)
+
+    pages = pipeline.iter_pages(
+        keywords,
+        page_size,
+        data_mode,
+        custom_start=custom_start,
+        custom_end=custom_end,
+        max_pages=max_pages,
+        max_in_flight=max_in_flight or MAX_IN_FLIGHT,
+    )
+    yield from pipeline.run(pages, accept, bloom_capacity=bloom_capacity)
+
+
+def stream_search(
+    keywords: List[str],
+    page_size: int,
+    data_mode: str,
+    *,
+    custom_start: str | None = None,
+    custom_end: str | None = None,
+    max_pages: int | None = None,
+    limit: int | None = None,
+    until: Callable[[BiliVideo], bool] | None = None,
+    max_in_flight: int | None = None,
+    since: Dict[str, int] | None = None,
+    overlap: int = 0,
+    on_page: Callable[[str, List[BiliVideo]], None] | None = None,
+    order: str | None = None,
+    enough: Callable[[], bool] | None = None,
+    **filter_kwargs,
+) -> Iterator[BiliVideo]:
+    """多关键词惰性流式搜索：逐轮翻页，边抓边筛边产出。
+
+    每一轮并发请求所有尚未翻完的关键词的下一页，经 filter_videos 过滤、
+    按 bvid 去重后，把各关键词的结果交错产出，避免前几个关键词占满名额。
+    只有当调用方消费完本轮结果还要继续迭代时，才会请求下一轮；
+    因此 ``itertools.islice(stream_search(...), n)`` 只会抓取凑够 n 条所需的页数。
+
+    Args:
+        max_pages: 每个关键词最多翻多少页，None 表示直到接口没有更多结果。
+        limit:     最多产出多少条，达到后停止抓取。
+        until:     谓词 until(video) 返回 True 时，产出该条后立即停止。
+        since:     增量模式下 {关键词: 水位线时间戳}；出现在其中的关键词只检索
+                   水位线（回退 overlap 秒）之后发布的视频，其余仍按 data_mode。
+        on_page:   每抓到一页原始（未过滤）结果时回调 on_page(keyword, videos)。
+        order:     排序方式，None 时水位线关键词按发布时间、其余按综合排序。
+        enough:    每轮结果全部产出后调用 enough()，返回 True 时不再抓取下一轮；
+                   与 limit 不同，调用方拿到的总是若干完整的轮次。
+        **filter_kwargs: 传递给 filter_videos 的可选参数（不打乱顺序）。
+
+    Yields:
+        通过过滤且未重复的 BiliVideo。
+    """
+    since = since or {}
+    active = [
+        (kw, iter_bilibili_pages(
+            kw,
+            page_size,
+            "since" if kw in since else data_mode,
+            custom_start=custom_start,
+            custom_end=custom_end,
+            since_ts=since.get(kw),
+            overlap=overlap,
+            max_pages=max_pages,
+            order=order,
+        ))
+        for kw in keywords
+    ]
+    workers = max(1, min(max_in_flight or MAX_IN_FLIGHT, len(keywords) or 1))
+    seen = BvidSet()
+    count = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while active:
+            pages = list(pool.map(lambda item: next(item[1], None), active))
+            if on_page:
+                for (kw, _), page in zip(active, pages):
+                    if page is not None:
+                        on_page(kw, page)
+            active = [item for item, page in zip(active, pages) if page is not None]
+
+            batches = [
+                filter_videos(page, shuffle=False, **filter_kwargs) if filter_kwargs else page
+                for page in pages
+                if page
+            ]
+            for group in zip_longest(*batches):
+                for v in group:
+                    if v is None or not seen.add(v.bvid):
+                        continue
+                    yield v
+                    count += 1
+                    if (limit is not None and count >= limit) or (until and until(v)):
+                        return
+            if enough is not None and enough():
+                return
+
+
+def sharded_search(
+    keywords: List[str],
+    page_size: int,
+    data_mode: str,
+    *,
+    custom_start: str | None = None,
+    custom_end: str | None = None,
+    shard_seconds: int | None = None,
+    max_in_flight: int | None = None,
+    **filter_kwargs,
+) -> Iterator[BiliVideo]:
+    """长时间范围（"1y"、大跨度 custom）的完整检索：按发布时间分片并发抓取。
+
+    结果数达到接口翻页上限的分片会自动二分重抓，见 modules.sharding。
+    每页边到边过滤、按 bvid 去重后产出，顺序为抓取完成的先后。
+    """
+    seen = BvidSet()
+    for _, _, page in iter_shard_pages(
+        keywords,
+        page_size,
+        data_mode,
+        custom_start=custom_start,
+        custom_end=custom_end,
+        shard_seconds=shard_seconds,
+        max_in_flight=max_in_flight,
+    ):
+        for v in filter_videos(page, shuffle=False, **filter_kwargs) if filter_kwargs else page:
+            if seen.add(v.bvid):
+                yield v
+
+
 if __name__ == "__main__":
     # --- 示例配置，可由前端或 CLI 参数覆盖 -----------------------------
     KEYWORDS = [